@@ -0,0 +1,270 @@
+"""Banc d'essai de charge et de latence de l'API et du moteur de scoring.
+
+Génère une ville synthétique (voir synthetic.SIZES), mesure les opérations
+de scoring puis lance une charge concurrente en processus sur l'application
+FastAPI. Rapporte, par endpoint et par opération, les latences p50/p95/p99,
+le débit et la mémoire résidente (RSS) ; peut enregistrer une référence et
+signaler les régressions par rapport à celle-ci.
+
+Le pic de RSS (``ru_maxrss``) ne fait que croître au fil du processus : chaque
+mesure tourne donc dans son propre processus enfant (fork, après la
+construction de la ville), qui rapporte son pic et la hausse de ce pic
+pendant la mesure.
+
+    python benchmark.py --size tracts --save benchmarks/tracts.json
+    python benchmark.py --size tracts --baseline benchmarks/tracts.json
+"""
+
+import asyncio
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+import traceback
+
+import httpx
+import numpy as np
+
+import main
+from cache import LRUCache
+from pipeline import refresh
+from scoring import CRITERIA, PROFILE_KEYS, SORTS, WEIGHTS, build_city, percentile_ranks, rank, score, top_k
+from snapshot import load_snapshot, write_snapshot
+from synthetic import SIZES, synthetic_city
+
+# Une latence p95 plus lente que la référence de plus de cette fraction est une régression
+TOLERANCE = 0.20
+# Positions de curseurs fréquentes pour /quartiers/top (le reste est tiré au hasard)
+POPULAR_WEIGHTS = [(1, 1, 1, 1, 1), (3, 1, 2, 1, 2), (1, 3, 1, 3, 1), (3, 2, 3, 1, 1), (1, 2, 1, 5, 1)]
+
+
+def peak_rss_mb():
+    """Pic de mémoire résidente du processus (Mo)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024**2 if sys.platform == "darwin" else peak / 1024
+
+
+def _child(measure, args, connection):
+    try:
+        start = peak_rss_mb()
+        result = measure(*args)
+        peak = peak_rss_mb()
+        connection.send((True, {**result, "peak_rss_mb": round(peak, 1), "rss_delta_mb": round(peak - start, 1)}))
+    except BaseException:
+        connection.send((False, traceback.format_exc()))
+    finally:
+        connection.close()
+
+
+def isolated(measure, *args):
+    """Exécute ``measure(*args)`` dans un processus enfant forké et retourne son résultat.
+
+    Le pic de RSS de l'enfant part de la RSS du parent au moment du fork ;
+    ``rss_delta_mb`` est la hausse de ce pic pendant la mesure seule.
+    """
+    context = multiprocessing.get_context("fork")
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=_child, args=(measure, args, sender))
+    process.start()
+    sender.close()
+    try:
+        ok, result = receiver.recv()
+    except EOFError:
+        ok, result = False, f"processus de mesure terminé (code {process.exitcode})"
+    process.join()
+    if not ok:
+        raise RuntimeError(f"Échec de la mesure {getattr(measure, '__name__', measure)} :\n{result}")
+    return result
+
+
+def summarize(latencies, wall):
+    latencies = np.asarray(latencies) * 1000.0
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {
+        "count": len(latencies),
+        "p50_ms": round(float(p50), 4),
+        "p95_ms": round(float(p95), 4),
+        "p99_ms": round(float(p99), 4),
+        "throughput_per_s": round(len(latencies) / wall, 1),
+    }
+
+
+def time_operation(operation, repeat):
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        operation()
+        latencies.append(time.perf_counter() - t0)
+    return summarize(latencies, time.perf_counter() - start)
+
+
+def bench_scoring(records, repeat):
+    """Chronomètre chaque étape du pipeline de scoring sur la ville synthétique."""
+    city = build_city(records)
+    rng = np.random.default_rng(1)
+    ids = rng.choice(city.ids, size=min(len(city), 1000), replace=False)
+    crime = {"security": dict(zip(ids.tolist(), rng.uniform(20, 120, len(ids)).tolist()))}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "city.snap")
+        write_snapshot(city, path)
+        operations = {
+            "build_city": lambda: build_city(records),
+            "score": lambda: score(city.raw),
+            "rank": lambda: rank(city.scores),
+            "percentile_ranks": lambda: percentile_ranks(city.scores),
+            "top_k": lambda: top_k(city.criteria, rng.random(len(CRITERIA)), 10),
+            "refresh_crime": lambda: refresh(city, "crime", crime),
+            "write_snapshot": lambda: write_snapshot(city, path),
+            "load_snapshot": lambda: load_snapshot(path),
+        }
+        return {name: isolated(time_operation, op, repeat) for name, op in operations.items()}
+
+
+def request_factories(city, rng):
+    """Générateurs d'URL aléatoires pour chaque endpoint mesuré."""
+
+    def ranking():
+        cursor = rng.integers(0, max(len(city) - 20, 1))
+        profile = PROFILE_KEYS[rng.integers(len(WEIGHTS))]
+        return f"/quartiers?profile={profile}&sort={SORTS[rng.integers(2)]}&limit=20&cursor={city.version}-{cursor}"
+
+    def detail():
+        return f"/quartiers/{city.ids[rng.integers(len(city))]}"
+
+    def custom_top():
+        weights = (
+            POPULAR_WEIGHTS[rng.integers(len(POPULAR_WEIGHTS))] if rng.random() < 0.8 else rng.integers(0, 6, 5) + 1
+        )
+        return "/quartiers/top?k=10&" + "&".join(f"{c}={w}" for c, w in zip(CRITERIA, weights))
+
+    def comparison():
+        return "/quartiers/comparaison?" + "&".join(f"ids={city.ids[i]}" for i in rng.integers(len(city), size=4))
+
+    return {"ranking": ranking, "detail": detail, "top": custom_top, "comparison": comparison}
+
+
+async def load_endpoint(client, next_url, requests, concurrency):
+    latencies = []
+    queue = iter(range(requests))
+
+    async def worker():
+        for _ in queue:
+            url = next_url()
+            t0 = time.perf_counter()
+            response = await client.get(url)
+            latencies.append(time.perf_counter() - t0)
+            response.raise_for_status()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, time.perf_counter() - start)
+
+
+def bench_endpoint(city, name, requests, concurrency):
+    """Charge concurrente en processus (transport ASGI, sans réseau) sur un endpoint, cache vide."""
+    main.city = city
+    main.top_k_cache = LRUCache(maxsize=main.top_k_cache.maxsize)
+    next_url = request_factories(city, np.random.default_rng(2))[name]
+
+    async def load():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            return await load_endpoint(client, next_url, requests, concurrency)
+
+    result = asyncio.run(load())
+    if name == "top":
+        result["cache_hit_rate"] = round(
+            main.top_k_cache.hits / max(main.top_k_cache.hits + main.top_k_cache.misses, 1), 3
+        )
+    return result
+
+
+def bench_api(city, requests, concurrency):
+    """Mesure chaque endpoint dans son propre processus enfant."""
+    return {
+        name: isolated(bench_endpoint, city, name, requests, concurrency)
+        for name in request_factories(city, None)
+    }
+
+
+def regressions(results, baseline, tolerance=TOLERANCE):
+    """Liste les mesures dont le p95 dépasse la référence de plus de ``tolerance``.
+
+    Une référence mesurée sur une autre taille de ville n'est pas comparable
+    et lève ``ValueError``.
+    """
+    if baseline.get("size") != results["size"]:
+        raise ValueError(
+            f"Référence mesurée sur {baseline.get('size')} quartiers, "
+            f"résultats sur {results['size']} : comparaison impossible"
+        )
+    found = []
+    for group, measures in results.items():
+        if group == "size":
+            continue
+        for name, measure in measures.items():
+            reference = baseline.get(group, {}).get(name)
+            if reference and measure["p95_ms"] > reference["p95_ms"] * (1 + tolerance):
+                found.append(f"{group}/{name} : p95 {measure['p95_ms']} ms (référence {reference['p95_ms']} ms)")
+    return found
+
+
+def run(size, requests, concurrency, repeat):
+    """Résultats du banc d'essai ; ``size`` y est le nombre de quartiers mesurés."""
+    records = synthetic_city(size)
+    city = build_city(records)
+    return {
+        "size": len(records),
+        "scoring": bench_scoring(records, repeat),
+        "api": bench_api(city, requests, concurrency),
+    }
+
+
+def report(results):
+    print(f"{results['size']} quartiers")
+    for group in ("scoring", "api"):
+        print(f"\n{group}")
+        print(f"  {'':<18}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'débit/s':>12}{'RSS Mo':>10}{'+RSS Mo':>10}")
+        for name, m in results[group].items():
+            print(
+                f"  {name:<18}{m['p50_ms']:>10.3f}{m['p95_ms']:>10.3f}{m['p99_ms']:>10.3f}"
+                f"{m['throughput_per_s']:>12.1f}{m['peak_rss_mb']:>10.1f}{m['rss_delta_mb']:>10.1f}"
+            )
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Banc d'essai de l'API et du moteur de scoring.")
+    parser.add_argument("--size", default="tracts", help=f"{', '.join(SIZES)} ou un nombre de quartiers")
+    parser.add_argument("--requests", type=int, default=1000, help="requêtes par endpoint")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--repeat", type=int, default=20, help="répétitions par opération de scoring")
+    parser.add_argument("--save", help="enregistre les résultats comme référence dans ce fichier JSON")
+    parser.add_argument("--baseline", help="compare les résultats à cette référence JSON")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    args = parser.parse_args()
+
+    size = args.size if args.size in SIZES else int(args.size)
+    results = run(size, args.requests, args.concurrency, args.repeat)
+    report(results)
+
+    if args.save:
+        os.makedirs(os.path.dirname(args.save) or ".", exist_ok=True)
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        try:
+            found = regressions(results, baseline, args.tolerance)
+        except ValueError as error:
+            parser.error(str(error))
+        for line in found:
+            print(f"RÉGRESSION {line}")
+        sys.exit(1 if found else 0)
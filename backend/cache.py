@@ -0,0 +1,34 @@
+"""Petit cache LRU thread-safe, avec compteurs de succès et d'échecs."""
+
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """Cache à éviction LRU : au-delà de ``maxsize`` entrées, la moins récemment lue est retirée."""
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, compute):
+        """Retourne la valeur de ``key``, en la calculant avec ``compute()`` si elle est absente."""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+        value = compute()
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return value
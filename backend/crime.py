@@ -0,0 +1,231 @@
+"""Ingestion en continu des actes criminels de Montréal pour le critère Sécurité.
+
+Le CSV des données ouvertes (colonnes CATEGORIE, DATE, LONGITUDE, LATITUDE,
+...) est lu par blocs de taille fixe : la mémoire reste bornée quelle que soit
+la taille du fichier. Chaque incident est rattaché à un polygone de quartier
+via un index en grille construit une seule fois, puis testé uniquement contre
+les polygones candidats de sa cellule.
+
+Les taux annuels pour 1 000 habitants, calculés avec la population de
+l'instantané publié, alimentent le critère ``security`` (source ``crime`` de
+pipeline.py).
+"""
+
+import csv
+import json
+from dataclasses import dataclass
+from itertools import islice
+
+import numpy as np
+
+from metrics import stage
+from scoring import STATISTICS
+
+CHUNK_SIZE = 100_000
+DAYS_PER_YEAR = 365.25
+
+
+def load_polygons(path, id_property="id"):
+    """Lit les polygones de quartiers d'un GeoJSON (Polygon ou MultiPolygon).
+
+    Retourne ``(ids, polygons)`` où chaque polygone est la liste de ses anneaux
+    (tableaux N x 2 de longitude, latitude), trous compris.
+    """
+    with open(path, encoding="utf-8") as f:
+        features = json.load(f)["features"]
+    ids, polygons = [], []
+    for feature in features:
+        geometry = feature["geometry"]
+        parts = [geometry["coordinates"]] if geometry["type"] == "Polygon" else geometry["coordinates"]
+        ids.append(str(feature["properties"][id_property]))
+        polygons.append([np.asarray(ring, dtype=np.float64)[:, :2] for part in parts for ring in part])
+    return ids, polygons
+
+
+def contains(rings, x, y):
+    """Test pair-impair vectorisé : quels points (x, y) sont dans le polygone ?
+
+    Boucle sur les arêtes, pas sur les points ; les trous sont gérés
+    naturellement par la règle pair-impair sur l'ensemble des anneaux.
+    """
+    inside = np.zeros(x.shape, dtype=bool)
+    for ring in rings:
+        x0, y0 = ring[:, 0], ring[:, 1]
+        x1, y1 = np.roll(x0, -1), np.roll(y0, -1)
+        for ax, ay, bx, by in zip(x0, y0, x1, y1):
+            if ay == by:
+                continue
+            crosses = (ay > y) != (by > y)
+            inside ^= crosses & (x < (bx - ax) * (y - ay) / (by - ay) + ax)
+    return inside
+
+
+class GridIndex:
+    """Index spatial en grille régulière sur les boîtes englobantes des polygones.
+
+    Chaque cellule garde, au format CSR, la liste des polygones dont la boîte
+    englobante la recoupe ; une requête ne teste que ces candidats.
+    """
+
+    def __init__(self, polygons, cells=64):
+        boxes = np.array(
+            [np.concatenate([np.vstack(p).min(axis=0), np.vstack(p).max(axis=0)]) for p in polygons]
+        ).reshape(-1, 4)
+        self.polygons = polygons
+        self.origin = boxes[:, :2].min(axis=0)
+        extent = boxes[:, 2:].max(axis=0) - self.origin
+        self.shape = np.array([cells, cells])
+        self.cell_size = np.where(extent > 0, extent / cells, 1.0)
+
+        low = self._cell(boxes[:, :2])
+        high = self._cell(boxes[:, 2:])
+        cell_ids, polygon_ids = [], []
+        for p, ((ix0, iy0), (ix1, iy1)) in enumerate(zip(low, high)):
+            gx, gy = np.meshgrid(np.arange(ix0, ix1 + 1), np.arange(iy0, iy1 + 1))
+            cell_ids.append((gy * cells + gx).ravel())
+            polygon_ids.append(np.full(gx.size, p))
+        cell_ids = np.concatenate(cell_ids) if cell_ids else np.empty(0, dtype=np.int64)
+        polygon_ids = np.concatenate(polygon_ids) if polygon_ids else np.empty(0, dtype=np.int64)
+        order = np.argsort(cell_ids, kind="stable")
+        self.indices = polygon_ids[order]
+        self.indptr = np.zeros(cells * cells + 1, dtype=np.int64)
+        np.cumsum(np.bincount(cell_ids, minlength=cells * cells), out=self.indptr[1:])
+
+    def _cell(self, points):
+        return np.clip(((points - self.origin) // self.cell_size).astype(np.int64), 0, self.shape - 1)
+
+    def locate(self, x, y):
+        """Retourne, pour chaque point, l'indice de son polygone ou -1."""
+        points = np.column_stack([x, y])
+        result = np.full(len(points), -1, dtype=np.int64)
+        cell = (points - self.origin) // self.cell_size
+        in_grid = np.all((cell >= 0) & (cell < self.shape), axis=1)
+        cell = cell[in_grid].astype(np.int64)
+        cell_ids = cell[:, 1] * self.shape[0] + cell[:, 0]
+
+        # Paires (point, polygon candidat) sans boucle Python par point
+        starts = self.indptr[cell_ids]
+        counts = self.indptr[cell_ids + 1] - starts
+        pair_points = np.repeat(np.flatnonzero(in_grid), counts)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        pair_polygons = self.indices[np.repeat(starts, counts) + offsets]
+
+        order = np.argsort(pair_polygons, kind="stable")
+        pair_points, pair_polygons = pair_points[order], pair_polygons[order]
+        bounds = np.flatnonzero(np.diff(pair_polygons)) + 1
+        for group in np.split(np.arange(len(pair_polygons)), bounds):
+            if not len(group):
+                continue
+            p = pair_polygons[group[0]]
+            candidates = pair_points[group]
+            candidates = candidates[result[candidates] == -1]
+            hits = candidates[contains(self.polygons[p], x[candidates], y[candidates])]
+            result[hits] = p
+        return result
+
+
+@dataclass(frozen=True)
+class CrimeCounts:
+    """Nombre d'incidents par quartier (lignes) et par catégorie (colonnes)."""
+
+    ids: tuple
+    categories: tuple
+    counts: np.ndarray
+    # Période couverte (années) du premier au dernier incident localisé, bornes comprises
+    years: float
+
+    def per_thousand(self, population):
+        """Incidents annuels pour 1 000 habitants : l'indicateur brut du critère ``security``."""
+        years = max(self.years, 1 / DAYS_PER_YEAR)
+        return self.counts.sum(axis=1) / years / np.asarray(population) * 1000.0
+
+    def refresh_values(self, city):
+        """Valeurs de la source ``crime`` au format attendu par ``pipeline.refresh``.
+
+        La population vient des statistiques de ``city`` ; les quartiers sans
+        population gardent leur valeur précédente.
+        """
+        rows = [city.position(id_) for id_ in self.ids]
+        unknown = [id_ for id_, row in zip(self.ids, rows) if row is None]
+        if unknown:
+            raise ValueError(f"Quartiers introuvables : {', '.join(unknown)}")
+        population = np.asarray(city.statistics)[rows, STATISTICS.index("population")]
+        populated = population > 0
+        rates = self.per_thousand(np.where(populated, population, 1.0))
+        return {"security": {id_: rate for id_, rate, p in zip(self.ids, rates.tolist(), populated) if p}}
+
+
+def read_chunks(path, chunk_size=CHUNK_SIZE):
+    """Génère les colonnes utiles du CSV par blocs de ``chunk_size`` lignes."""
+    with open(path, encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        category, date, lon, lat = (header.index(c) for c in ("CATEGORIE", "DATE", "LONGITUDE", "LATITUDE"))
+        while rows := list(islice(reader, chunk_size)):
+            yield (
+                [r[category] for r in rows],
+                np.array([r[date][:10] for r in rows], dtype="datetime64[D]"),
+                np.array([r[lon] or "nan" for r in rows], dtype=np.float64),
+                np.array([r[lat] or "nan" for r in rows], dtype=np.float64),
+            )
+
+
+def count_incidents(csv_path, ids, polygons, chunk_size=CHUNK_SIZE):
+    """Compte les incidents du CSV par quartier et par catégorie, en continu."""
+    index = GridIndex(polygons)
+    categories = {}
+    counts = np.zeros((len(ids), 0), dtype=np.int64)
+    first = last = None
+    for names, dates, lon, lat in read_chunks(csv_path, chunk_size):
+        # Les incidents sans position sont publiés avec des coordonnées nulles
+        located = np.isfinite(lon) & np.isfinite(lat) & (lon != 0) & (lat != 0)
+        polygon = np.full(len(names), -1, dtype=np.int64)
+        with stage("ingest_locate"):
+            polygon[located] = index.locate(lon[located], lat[located])
+
+        codes = np.array([categories.setdefault(name, len(categories)) for name in names], dtype=np.int64)
+        if len(categories) > counts.shape[1]:
+            counts = np.pad(counts, ((0, 0), (0, len(categories) - counts.shape[1])))
+        hit = polygon >= 0
+        flat = np.bincount(polygon[hit] * len(categories) + codes[hit], minlength=len(ids) * len(categories))
+        counts += flat.reshape(len(ids), len(categories))
+
+        # Seuls les incidents comptés délimitent la période couverte
+        dates = dates[hit][~np.isnat(dates[hit])]
+        if len(dates):
+            first = dates.min() if first is None else min(first, dates.min())
+            last = dates.max() if last is None else max(last, dates.max())
+    years = 0.0 if first is None else ((last - first).astype(int) + 1) / DAYS_PER_YEAR
+    return CrimeCounts(ids=tuple(ids), categories=tuple(categories), counts=counts, years=years)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compte les actes criminels par quartier et par catégorie.")
+    parser.add_argument("incidents", help="CSV des actes criminels (données ouvertes de Montréal)")
+    parser.add_argument("quartiers", help="GeoJSON des limites de quartiers")
+    parser.add_argument("--id-property", default="id")
+    parser.add_argument(
+        "--snapshot", help="instantané .snap dont la population sert à émettre les valeurs de la source crime"
+    )
+    args = parser.parse_args()
+
+    result = count_incidents(args.incidents, *load_polygons(args.quartiers, args.id_property))
+    if args.snapshot:
+        from snapshot import load_snapshot
+
+        print(json.dumps(result.refresh_values(load_snapshot(args.snapshot)), ensure_ascii=False, indent=2))
+        raise SystemExit
+    print(
+        json.dumps(
+            {
+                "years": result.years,
+                "counts": {
+                    id_: dict(zip(result.categories, row)) for id_, row in zip(result.ids, result.counts.tolist())
+                },
+            },
+            ensure_ascii=False,
+            indent=2,
+        )
+    )
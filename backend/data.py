@@ -0,0 +1,83 @@
+# Données temporaires des quartiers - à remplacer par les pipelines d'ingestion
+#
+# Chaque quartier porte ses indicateurs bruts (voir scoring.INDICATORS pour les
+# unités) ; les scores affichés par le frontend sont calculés par scoring.py.
+
+NEIGHBORHOODS = [
+    {
+        "id": "1",
+        "name": "Rosemont",
+        "description": "Découvrez les informations clés du quartier Rosemont",
+        "indicators": {
+            "security": 24.0,
+            "transport": 40.5,
+            "service": 15.6,
+            "cost": 1270.0,
+            "leisure": 33.2,
+        },
+        "statistics": {
+            "medianIncome": 62000,
+            "population": 142000,
+            "subwayStations": 3,
+        },
+        "strengths": ["Nombreux parcs et services", "Excellent accès au transport"],
+        "weaknesses": ["Loyers plus élevés"],
+    },
+    {
+        "id": "2",
+        "name": "Plateau-Mont-Royal",
+        "description": "Découvrez les informations clés du quartier Plateau-Mont-Royal",
+        "indicators": {
+            "security": 42.0,
+            "transport": 40.5,
+            "service": 17.0,
+            "cost": 1750.0,
+            "leisure": 30.0,
+        },
+        "statistics": {
+            "medianIncome": 55000,
+            "population": 108000,
+            "subwayStations": 5,
+        },
+        "strengths": ["Vie culturelle vibrante", "Nombreux restaurants et cafés"],
+        "weaknesses": ["Coût de logement élevé", "Stationnement difficile"],
+    },
+    {
+        "id": "3",
+        "name": "Villeray",
+        "description": "Découvrez les informations clés du quartier Villeray",
+        "indicators": {
+            "security": 32.0,
+            "transport": 42.0,
+            "service": 16.4,
+            "cost": 1375.0,
+            "leisure": 32.0,
+        },
+        "statistics": {
+            "medianIncome": 58000,
+            "population": 95000,
+            "subwayStations": 4,
+        },
+        "strengths": ["Bon équilibre qualité-prix", "Quartier familial"],
+        "weaknesses": ["Moins d'options de divertissement"],
+    },
+    {
+        "id": "4",
+        "name": "Outremont",
+        "description": "Découvrez les informations clés du quartier Outremont",
+        "indicators": {
+            "security": 35.0,
+            "transport": 40.0,
+            "service": 15.6,
+            "cost": 1525.0,
+            "leisure": 28.0,
+        },
+        "statistics": {
+            "medianIncome": 75000,
+            "population": 24000,
+            "subwayStations": 2,
+        },
+        "strengths": ["Quartier résidentiel calme", "Excellentes écoles"],
+        "weaknesses": ["Moins accessible en transport", "Prix élevés"],
+    },
+]
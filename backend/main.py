@@ -1,10 +1,250 @@
-from fastapi import FastAPI
+import math
+import os
+import re
+import time
+
+import numpy as np
+from fastapi import FastAPI, HTTPException, Query
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+from cache import LRUCache
+from data import NEIGHBORHOODS
+from metrics import CONTENT_TYPE, REGISTRY, Callback, MetricsMiddleware, stage
+from scoring import CRITERIA, PROFILE_KEYS, SORTS, STATISTICS, build_city, top_k
+from snapshot import load_snapshot
 
 app = FastAPI()
+app.add_middleware(MetricsMiddleware)
+
+# En production, chaque worker projette l'instantané écrit par le pipeline
+# (python snapshot.py ...) au lieu de recalculer les scores au démarrage.
+SNAPSHOT_PATH = os.environ.get("URBANSCORE_SNAPSHOT")
+# Intervalle (s) entre deux vérifications d'une nouvelle version de l'instantané
+RELOAD_INTERVAL = 5.0
+
+# Les pondérations personnalisées sont arrondies au centième avant la mise en
+# cache : des positions de curseurs voisines partagent la même entrée.
+WEIGHT_STEPS = 100
+# Borne des pondérations brutes : leur somme reste finie et exacte
+MAX_WEIGHT = 1000.0
+top_k_cache = LRUCache(maxsize=1024)
+
+if SNAPSHOT_PATH:
+    city = load_snapshot(SNAPSHOT_PATH)
+    snapshot_mtime = os.stat(SNAPSHOT_PATH).st_mtime_ns
+else:
+    city = build_city(NEIGHBORHOODS)
+    snapshot_mtime = None
+next_check = time.monotonic() + RELOAD_INTERVAL
+
+
+def current_city():
+    """Retourne la version courante des données, en rechargeant l'instantané s'il a été republié.
+
+    Le pipeline remplace le fichier de façon atomique ; chaque requête lit une
+    seule référence et ne mélange donc jamais deux versions.
+    """
+    global city, snapshot_mtime, next_check
+    if SNAPSHOT_PATH and time.monotonic() >= next_check:
+        next_check = time.monotonic() + RELOAD_INTERVAL
+        mtime = os.stat(SNAPSHOT_PATH).st_mtime_ns
+        if mtime != snapshot_mtime:
+            city, snapshot_mtime = load_snapshot(SNAPSHOT_PATH), mtime
+    return city
+
+
+REGISTRY.register(
+    Callback(
+        "urbanscore_cache_requests_total",
+        "Consultations du cache top-k par résultat.",
+        "counter",
+        lambda: {("hit",): top_k_cache.hits, ("miss",): top_k_cache.misses},
+        ("result",),
+    )
+)
+REGISTRY.register(
+    Callback("urbanscore_cache_entries", "Entrées du cache top-k.", "gauge", lambda: {(): len(top_k_cache)})
+)
+REGISTRY.register(
+    Callback("urbanscore_data_version", "Version des données servies.", "gauge", lambda: {(): current_city().version})
+)
+REGISTRY.register(
+    Callback(
+        "urbanscore_snapshot_age_seconds",
+        "Âge de la version des données servies.",
+        "gauge",
+        lambda: {(): round(time.time() - current_city().created_at, 3)},
+    )
+)
+REGISTRY.register(
+    Callback("urbanscore_neighborhoods", "Quartiers dans la version servie.", "gauge", lambda: {(): len(current_city())})
+)
+
+
+def profile_column(profile):
+    if profile not in PROFILE_KEYS:
+        raise HTTPException(status_code=400, detail=f"Profil inconnu : {profile}")
+    return PROFILE_KEYS.index(profile)
+
+
+def summaries(city, rows, scores):
+    """Sérialise les lignes demandées colonne par colonne (une conversion NumPy par colonne)."""
+    columns = {
+        "score": np.asarray(scores).round().astype(int).tolist(),
+        **{c: city.criteria[rows, j].round().astype(int).tolist() for j, c in enumerate(CRITERIA)},
+    }
+    return [
+        {"id": city.ids[i], "name": city.names[i], **{key: values[k] for key, values in columns.items()}}
+        for k, i in enumerate(rows)
+    ]
+
 
-# @app.get("/quartiers")
-# def read_quartiers():
-#     return [{"nom": "Plateau-Mont-Royal", "score": 82}]
 @app.get("/")
 def read_root():
-    return {"message": "Hello FastAPI!"}
\ No newline at end of file
+    return {"message": "Hello FastAPI!"}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def read_metrics():
+    """Métriques du worker qui répond (le registre est propre à chaque processus, voir metrics.py)."""
+    return PlainTextResponse(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+
+def decode_cursor(city, cursor):
+    """Retourne la position encodée dans ``cursor`` (``<version des données>-<position>``).
+
+    Un curseur émis pour une autre version des données est refusé : le
+    classement a pu changer entre deux pages.
+    """
+    match = re.fullmatch(r"([0-9]+)-([0-9]+)", cursor)
+    if match is None or int(match[2]) > len(city):
+        raise HTTPException(status_code=400, detail="Curseur invalide")
+    if int(match[1]) != city.version:
+        raise HTTPException(status_code=409, detail="Curseur périmé : les données ont changé, reprendre au début")
+    return int(match[2])
+
+
+@app.get("/quartiers")
+def read_quartiers(
+    profile: str = "global",
+    sort: str = "best",
+    limit: int = Query(20, ge=1, le=100),
+    cursor: str | None = None,
+):
+    """Une page du classement déjà trié et pondéré selon le profil.
+
+    Le curseur est la position dans l'index de classement précalculé : servir
+    une page ne coûte qu'une tranche de ``limit`` lignes.
+    """
+    city = current_city()
+    profile_index = profile_column(profile)
+    if sort not in SORTS:
+        raise HTTPException(status_code=400, detail=f"Tri inconnu : {sort}")
+    start = 0 if cursor is None else decode_cursor(city, cursor)
+
+    rows = city.rankings[SORTS.index(sort), profile_index, start : start + limit]
+    end = start + len(rows)
+    # La réponse est encodée ici : FastAPI ne réencode pas une Response, et
+    # l'étape couvre toute la sérialisation jusqu'aux octets JSON.
+    with stage("serialize"):
+        return JSONResponse(
+            {
+                "items": summaries(city, rows, city.scores[rows, profile_index]),
+                "nextCursor": f"{city.version}-{end}" if end < len(city) else None,
+            }
+        )
+
+
+def quantize(weights):
+    if not all(math.isfinite(w) for w in weights):
+        raise HTTPException(status_code=400, detail="Les pondérations doivent être des nombres finis")
+    total = sum(weights)
+    quantized = tuple(round(w / total * WEIGHT_STEPS) for w in weights) if total > 0 else ()
+    if not any(quantized):
+        raise HTTPException(status_code=400, detail="Au moins une pondération doit être positive")
+    return quantized
+
+
+@app.get("/quartiers/top")
+def read_top(
+    security: float = Query(1.0, ge=0, le=MAX_WEIGHT),
+    transport: float = Query(1.0, ge=0, le=MAX_WEIGHT),
+    service: float = Query(1.0, ge=0, le=MAX_WEIGHT),
+    cost: float = Query(1.0, ge=0, le=MAX_WEIGHT),
+    leisure: float = Query(1.0, ge=0, le=MAX_WEIGHT),
+    k: int = Query(10, ge=1, le=100),
+):
+    """Les ``k`` meilleurs quartiers selon une pondération choisie par l'utilisateur."""
+    city = current_city()
+    weights = quantize((security, transport, service, cost, leisure))
+    # La clé identifie les lignes (empreinte des ids) et ne retient que les
+    # versions des critères pondérés : un rafraîchissement d'un autre critère
+    # laisse l'entrée valide, un autre jeu de quartiers ne la réutilise jamais.
+    versions = tuple(v for w, v in zip(weights, city.criteria_versions) if w)
+
+    @stage("top_k")
+    def compute():
+        return top_k(city.criteria, weights, k)
+
+    rows, scores = top_k_cache.get((city.dataset_id, weights, k, versions), compute)
+    with stage("serialize"):
+        return JSONResponse(
+            {
+                "weights": dict(zip(CRITERIA, (w / sum(weights) for w in weights))),
+                "items": summaries(city, rows, scores),
+            }
+        )
+
+
+@app.get("/quartiers/comparaison")
+def read_comparaison(ids: list[str] = Query(..., max_length=20), profile: str = "global"):
+    """Compare plusieurs quartiers en un seul aller-retour, sous forme colonnaire.
+
+    Chaque valeur est accompagnée de son rang centile à l'échelle de la ville,
+    précalculé au chargement des données.
+    """
+    city = current_city()
+    profile_index = profile_column(profile)
+    rows = [city.position(id_) for id_ in ids]
+    unknown = [id_ for id_, i in zip(ids, rows) if i is None]
+    if unknown:
+        raise HTTPException(status_code=404, detail=f"Quartiers introuvables : {', '.join(unknown)}")
+
+    def columns(matrix, names):
+        return {name: matrix[rows, j].round().astype(int).tolist() for j, name in enumerate(names)}
+
+    with stage("serialize"):
+        return JSONResponse(
+            {
+                "ids": list(ids),
+                "names": [city.names[i] for i in rows],
+                "scores": {
+                    "score": city.scores[rows, profile_index].round().astype(int).tolist(),
+                    **columns(city.criteria, CRITERIA),
+                },
+                "statistics": columns(city.statistics, STATISTICS),
+                "percentiles": {
+                    "score": city.score_percentiles[rows, profile_index].round().astype(int).tolist(),
+                    **columns(city.criteria_percentiles, CRITERIA),
+                    **columns(city.statistics_percentiles, STATISTICS),
+                },
+            }
+        )
+
+
+@app.get("/quartiers/{neighborhood_id}")
+def read_quartier(neighborhood_id: str, profile: str = "global"):
+    city = current_city()
+    i = city.position(neighborhood_id)
+    if i is None:
+        raise HTTPException(status_code=404, detail="Quartier introuvable")
+    profile_index = profile_column(profile)
+    with stage("serialize"):
+        (summary,) = summaries(city, [i], city.scores[[i], profile_index])
+        return JSONResponse(
+            {
+                **summary,
+                **city.details[i],
+                "statistics": dict(zip(STATISTICS, city.statistics[i].astype(int).tolist())),
+            }
+        )
@@ -0,0 +1,170 @@
+"""Instrumentation du service et exposition au format texte Prometheus.
+
+Le chemin des requêtes ne fait qu'incrémenter des compteurs en mémoire
+(une recherche de seau et quelques additions sous verrou) ; tout le formatage
+a lieu au moment de la collecte, sur ``/metrics``. Les valeurs qui existent
+déjà ailleurs (succès du cache, version des données) sont lues par des
+fonctions de rappel à la collecte, sans coût par requête.
+
+Le registre vit dans la mémoire de chaque processus : avec plusieurs workers
+uvicorn, ``/metrics`` ne décrit que le worker qui a répondu (identifié par
+``urbanscore_worker_info{pid=...}``) et deux collectes successives peuvent
+tomber sur des workers différents. Pour des totaux exacts, exposer chaque
+worker comme une cible de collecte distincte (un processus par port) et
+agréger côté Prometheus.
+"""
+
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seaux (s) couvrant une requête servie depuis le cache jusqu'à un rechargement complet
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for v in values)
+    return "{" + ",".join(f'{n}="{v}"' for n, v in zip(names, escaped)) + "}"
+
+
+class Histogram:
+    """Histogramme à seaux fixes, une série par combinaison de valeurs d'étiquettes."""
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def collect(self):
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            series = [(labels, list(counts), total) for labels, (counts, total) in self._series.items()]
+        for labels, counts, total in sorted(series):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                yield f"{self.name}_bucket{_labels((*self.labelnames, 'le'), (*labels, bound))} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, labels)} {total}"
+            yield f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}"
+
+
+class Callback:
+    """Métrique (gauge ou counter) dont les séries sont lues à la collecte.
+
+    ``callback`` retourne un dictionnaire ``{valeurs d'étiquettes: valeur}``.
+    """
+
+    def __init__(self, name, documentation, kind, callback, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.kind = kind
+        self.callback = callback
+        self.labelnames = tuple(labelnames)
+
+    def collect(self):
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} {self.kind}"
+        for labels, value in self.callback().items():
+            yield f"{self.name}{_labels(self.labelnames, labels)} {value}"
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        return "\n".join(line for metric in self.metrics for line in metric.collect()) + "\n"
+
+
+REGISTRY = Registry()
+
+REQUEST_SECONDS = REGISTRY.register(
+    Histogram(
+        "urbanscore_request_duration_seconds",
+        "Durée des requêtes HTTP par route.",
+        ("method", "route", "status"),
+    )
+)
+STAGE_SECONDS = REGISTRY.register(
+    Histogram(
+        "urbanscore_stage_duration_seconds",
+        "Durée des étapes des pipelines de scoring et d'ingestion.",
+        ("stage",),
+    )
+)
+REGISTRY.register(
+    Callback(
+        "urbanscore_worker_info",
+        "Processus dont le registre est exposé (les métriques ne couvrent que ce worker).",
+        "gauge",
+        lambda: {(os.getpid(),): 1},
+        ("pid",),
+    )
+)
+
+
+@contextmanager
+def stage(name):
+    """Chronomètre une étape (chargement, normalisation, pondération, classement, ...)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe((name,), time.perf_counter() - start)
+
+
+class MetricsMiddleware:
+    """Middleware ASGI qui mesure chaque requête HTTP, étiquetée par le gabarit de sa route.
+
+    Utiliser le gabarit (``/quartiers/{neighborhood_id}``) plutôt que le
+    chemin garde un nombre de séries borné.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            REQUEST_SECONDS.observe(
+                (scope["method"], route.path if route is not None else "unmatched", status),
+                time.perf_counter() - start,
+            )
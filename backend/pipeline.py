@@ -0,0 +1,150 @@
+"""Recalcul incrémental quand une seule source de données est rafraîchie.
+
+Les sources n'ont pas la même cadence (criminalité quotidienne, STM
+trimestrielle, recensement tous les quelques années). Le graphe de
+dépendances ci-dessous relie chaque source aux colonnes brutes qu'elle
+alimente, puis aux colonnes dérivées :
+
+    source -> indicateur -> critère -> scores des profils qui le pondèrent
+                                     -> classements et centiles de ces profils
+           -> statistique -> centiles de cette statistique
+    census -> population -> indicateurs par habitant (sécurité, services, loisirs)
+
+Les indicateurs par habitant gardent leur numérateur (incidents, services,
+m² de parcs) : quand la population change, ils sont remis à l'échelle par
+ancienne population / nouvelle population, puis suivent le même chemin.
+
+Un rafraîchissement ne recalcule que les colonnes touchées ; les autres
+tableaux sont partagés tels quels avec la version précédente.
+"""
+
+import dataclasses
+import time
+
+import numpy as np
+
+from metrics import stage
+from scoring import CRITERIA, STATISTICS, WEIGHTS, normalize, percentile_ranks, rank, rescale
+
+# Colonnes brutes (indicateurs de CRITERIA ou STATISTICS) fournies par chaque source
+SOURCES = {
+    "crime": ("security",),
+    "transit": ("transport", "subwayStations"),
+    "services": ("service",),
+    "rent": ("cost",),
+    "parks": ("leisure",),
+    "census": ("medianIncome", "population"),
+}
+# Indicateurs rapportés à la population (voir scoring.INDICATORS)
+PER_CAPITA = ("security", "service", "leisure")
+
+
+def dependents(columns):
+    """Indices des critères, statistiques et profils à recalculer quand ``columns`` change."""
+    per_capita = PER_CAPITA if "population" in columns else ()
+    criteria = [j for j, c in enumerate(CRITERIA) if c in columns or c in per_capita]
+    statistics = [j for j, s in enumerate(STATISTICS) if s in columns]
+    profiles = np.flatnonzero(WEIGHTS[:, criteria].any(axis=1)).tolist()
+    return criteria, statistics, profiles
+
+
+def _update(matrix, rows, columns, values):
+    matrix = np.array(matrix)
+    matrix[np.ix_(rows, columns)] = values
+    return matrix
+
+
+@stage("refresh")
+def refresh(city, source, values):
+    """Retourne la version suivante de ``city`` après un rafraîchissement de ``source``.
+
+    ``values`` associe chaque colonne de la source à un dictionnaire
+    ``{id de quartier: nouvelle valeur}`` ; les quartiers absents gardent
+    leur valeur précédente.
+    """
+    if source not in SOURCES:
+        raise ValueError(f"Source inconnue : {source}")
+    unexpected = set(values) - set(SOURCES[source])
+    if unexpected:
+        raise ValueError(f"Colonnes hors de la source {source} : {', '.join(sorted(unexpected))}")
+
+    criteria_columns, statistics_columns, profiles = dependents(values)
+    version = city.version + 1
+    changes = {"version": version, "created_at": time.time()}
+
+    def updated(matrix, names, columns):
+        for j in columns:
+            updates = values[names[j]]
+            unknown = [id_ for id_ in updates if city.position(id_) is None]
+            if unknown:
+                raise ValueError(f"Quartiers introuvables : {', '.join(unknown)}")
+            rows = [city.position(id_) for id_ in updates]
+            matrix = _update(matrix, rows, [j], np.fromiter(updates.values(), dtype=np.float64)[:, None])
+        return matrix
+
+    if statistics_columns:
+        statistics = updated(city.statistics, STATISTICS, statistics_columns)
+        changes.update(
+            statistics=statistics,
+            statistics_percentiles=_update(
+                city.statistics_percentiles,
+                range(len(city)),
+                statistics_columns,
+                percentile_ranks(statistics[:, statistics_columns]),
+            ),
+        )
+
+    if criteria_columns:
+        raw = np.array(updated(city.raw, CRITERIA, [j for j in criteria_columns if CRITERIA[j] in values]))
+        # Numérateur inchangé : indicateur x ancienne population / nouvelle population
+        if "population" in values:
+            population = STATISTICS.index("population")
+            old, new = city.statistics[:, population], statistics[:, population]
+            ratio = np.divide(old, new, out=np.ones(len(city)), where=new > 0)
+            raw[:, [CRITERIA.index(c) for c in PER_CAPITA]] *= ratio[:, None]
+        criteria = _update(
+            city.criteria,
+            range(len(city)),
+            criteria_columns,
+            rescale(normalize(raw[:, criteria_columns], criteria_columns)),
+        )
+        scores = _update(city.scores, range(len(city)), profiles, criteria @ WEIGHTS[profiles].T)
+        rankings = np.array(city.rankings)
+        rankings[:, profiles] = rank(scores[:, profiles])
+        changes.update(
+            raw=raw,
+            criteria=criteria,
+            scores=scores,
+            rankings=rankings,
+            criteria_percentiles=_update(
+                city.criteria_percentiles,
+                range(len(city)),
+                criteria_columns,
+                percentile_ranks(criteria[:, criteria_columns]),
+            ),
+            score_percentiles=_update(
+                city.score_percentiles, range(len(city)), profiles, percentile_ranks(scores[:, profiles])
+            ),
+            criteria_versions=tuple(
+                version if j in criteria_columns else v for j, v in enumerate(city.criteria_versions)
+            ),
+        )
+
+    return dataclasses.replace(city, **changes)
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    from snapshot import load_snapshot, write_snapshot
+
+    parser = argparse.ArgumentParser(description="Rafraîchit une source et publie une nouvelle version de l'instantané.")
+    parser.add_argument("snapshot", help="instantané .snap à mettre à jour (remplacé de façon atomique)")
+    parser.add_argument("source", choices=sorted(SOURCES))
+    parser.add_argument("values", help='JSON {"colonne": {"id": valeur}}')
+    args = parser.parse_args()
+
+    with open(args.values, encoding="utf-8") as f:
+        new_values = json.load(f)
+    write_snapshot(refresh(load_snapshot(args.snapshot), args.source, new_values), args.snapshot)
@@ -0,0 +1,201 @@
+"""Moteur de scoring vectorisé des quartiers.
+
+Les indicateurs bruts de tous les quartiers forment une seule matrice
+(quartiers x critères). La normalisation, la pondération et la remise à
+l'échelle 0-100 sont faites en une passe NumPy pour tous les quartiers et
+tous les profils à la fois, sans boucle Python par quartier.
+"""
+
+import hashlib
+import time
+from collections.abc import Mapping, Sequence
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from metrics import stage
+
+CRITERIA = ("security", "transport", "service", "cost", "leisure")
+STATISTICS = ("medianIncome", "population", "subwayStations")
+
+# Indicateur brut de chaque critère : (unité, borne pire, borne meilleure).
+# Quand "moins" est meilleur (crimes, loyer), la borne pire est la plus haute.
+INDICATORS = {
+    "security": ("crimes pour 1 000 habitants", 120.0, 20.0),
+    "transport": ("arrêts STM par km²", 0.0, 50.0),
+    "service": ("services essentiels pour 1 000 habitants", 0.0, 20.0),
+    "cost": ("loyer médian mensuel ($)", 2500.0, 1000.0),
+    "leisure": ("m² de parcs par habitant", 0.0, 40.0),
+}
+WORST = np.array([INDICATORS[c][1] for c in CRITERIA])
+BEST = np.array([INDICATORS[c][2] for c in CRITERIA])
+
+# Pondérations par profil, dans l'ordre de CRITERIA. Le profil "global"
+# reprend la répartition affichée sur la page À propos.
+PROFILES = {
+    "global": ("Score global", (0.20, 0.30, 0.00, 0.25, 0.25)),
+    "famille": ("Famille", (0.30, 0.15, 0.25, 0.10, 0.20)),
+    "etudiants": ("Étudiants", (0.10, 0.35, 0.10, 0.30, 0.15)),
+    "personne-agee": ("Personne âgée", (0.30, 0.25, 0.30, 0.05, 0.10)),
+    "petit-budget": ("Petit budget", (0.10, 0.20, 0.10, 0.50, 0.10)),
+}
+PROFILE_KEYS = tuple(PROFILES)
+SORTS = ("best", "worst")
+
+
+def weight_matrix(weights):
+    """Retourne les pondérations (profils x critères) ramenées à une somme de 1."""
+    weights = np.atleast_2d(np.asarray(weights, dtype=np.float64))
+    return weights / weights.sum(axis=1, keepdims=True)
+
+
+WEIGHTS = weight_matrix([w for _, w in PROFILES.values()])
+
+
+def normalize(raw, columns=slice(None)):
+    """Ramène chaque indicateur brut sur [0, 1] entre ses bornes pire et meilleure.
+
+    ``columns`` désigne les critères présents dans ``raw`` quand on ne
+    normalise qu'une partie d'entre eux.
+    """
+    worst, best = WORST[columns], BEST[columns]
+    return np.clip((raw - worst) / (best - worst), 0.0, 1.0)
+
+
+def rescale(values):
+    """Passe des valeurs [0, 1] à l'échelle 0-100 affichée."""
+    return values * 100.0
+
+
+def score(raw, weights=WEIGHTS):
+    """Calcule les scores par critère et par profil de tous les quartiers.
+
+    Retourne ``(criteria, scores)`` : une matrice quartiers x critères et une
+    matrice quartiers x profils, toutes deux sur 0-100.
+    """
+    with stage("normalize"):
+        normalized = normalize(raw)
+    with stage("weight"):
+        return rescale(normalized), rescale(normalized @ weights.T)
+
+
+def rank(scores):
+    """Matérialise l'ordre de classement de chaque profil, dans chaque sens de tri.
+
+    Retourne un tableau (sens x profils x quartiers) de positions de lignes ;
+    à score égal, l'ordre d'origine des quartiers départage.
+    """
+    positions = np.arange(scores.shape[0])
+    return np.array(
+        [[np.lexsort((positions, sign * column)) for column in scores.T] for sign in (-1, 1)],
+        dtype=np.int64,
+    ).reshape(len(SORTS), scores.shape[1], scores.shape[0])
+
+
+def top_k(criteria, weights, k):
+    """Les ``k`` meilleurs quartiers pour une pondération arbitraire.
+
+    Sélection partielle (``argpartition``) en O(n), puis tri des seuls
+    candidats retenus. Les ex æquo du k-ième score sont tous retenus : la
+    ligne la plus basse gagne, comme dans ``rank``. Retourne ``(rows, scores)``.
+    """
+    scores = criteria @ weight_matrix(weights)[0]
+    k = min(k, len(scores))
+    if 0 < k < len(scores):
+        threshold = scores[np.argpartition(-scores, k - 1)[k - 1]]
+        rows = np.flatnonzero(scores >= threshold)
+    else:
+        rows = np.arange(len(scores))
+    rows = rows[np.lexsort((rows, -scores[rows]))][:k]
+    return rows, scores[rows]
+
+
+def percentile_ranks(values):
+    """Rang centile de chaque valeur dans sa colonne (part des quartiers ayant une valeur inférieure ou égale)."""
+    if not len(values):
+        return np.empty_like(values)
+    ordered = np.sort(values, axis=0)
+    ranks = np.column_stack(
+        [np.searchsorted(ordered[:, j], values[:, j], side="right") for j in range(values.shape[1])]
+    )
+    return rescale(ranks.reshape(values.shape) / len(values))
+
+
+@dataclass(frozen=True)
+class City:
+    """Quartiers d'une ville sous forme colonnaire, avec leurs scores calculés.
+
+    ``ids``, ``names`` et ``details`` sont des séquences indexées par ligne :
+    des tuples après ``build_city``, des colonnes projetées après
+    ``snapshot.load_snapshot``. ``positions`` expose ``get(id)``.
+    """
+
+    ids: Sequence
+    names: Sequence
+    raw: np.ndarray
+    statistics: np.ndarray
+    criteria: np.ndarray
+    scores: np.ndarray
+    rankings: np.ndarray
+    score_percentiles: np.ndarray
+    criteria_percentiles: np.ndarray
+    statistics_percentiles: np.ndarray
+    details: Sequence
+    positions: Mapping = field(repr=False)
+    version: int = 1
+    created_at: float = 0.0
+    # Version des données à laquelle chaque critère a changé pour la dernière fois
+    criteria_versions: tuple = ()
+    # Empreinte de la liste ordonnée des ids : deux villes de même empreinte ont les mêmes lignes
+    dataset_id: str = ""
+
+    def __len__(self):
+        return len(self.ids)
+
+    def position(self, neighborhood_id):
+        """Retourne la ligne du quartier, ou ``None`` s'il est inconnu."""
+        return self.positions.get(neighborhood_id)
+
+
+def dataset_id(ids):
+    """Empreinte de la liste ordonnée des ids (identité des lignes de la ville)."""
+    digest = hashlib.blake2b(digest_size=8)
+    for id_ in ids:
+        digest.update(id_.encode("utf-8") + b"\0")
+    return digest.hexdigest()
+
+
+def build_city(records, version=1):
+    """Construit la matrice des indicateurs et score toute la ville en une passe."""
+    with stage("load"):
+        ids = tuple(r["id"] for r in records)
+        raw = np.array([[r["indicators"][c] for c in CRITERIA] for r in records], dtype=np.float64)
+        raw = raw.reshape(-1, len(CRITERIA))
+        statistics = np.array([[r["statistics"][s] for s in STATISTICS] for r in records], dtype=np.float64)
+        statistics = statistics.reshape(-1, len(STATISTICS))
+    criteria, scores = score(raw)
+    with stage("rank"):
+        rankings = rank(scores)
+    with stage("percentiles"):
+        percentiles = percentile_ranks(scores), percentile_ranks(criteria), percentile_ranks(statistics)
+    return City(
+        ids=ids,
+        names=tuple(r["name"] for r in records),
+        raw=raw,
+        statistics=statistics,
+        criteria=criteria,
+        scores=scores,
+        rankings=rankings,
+        score_percentiles=percentiles[0],
+        criteria_percentiles=percentiles[1],
+        statistics_percentiles=percentiles[2],
+        details=tuple(
+            {"description": r["description"], "strengths": r["strengths"], "weaknesses": r["weaknesses"]}
+            for r in records
+        ),
+        positions={id_: i for i, id_ in enumerate(ids)},
+        version=version,
+        created_at=time.time(),
+        criteria_versions=(version,) * len(CRITERIA),
+        dataset_id=dataset_id(ids),
+    )
@@ -0,0 +1,197 @@
+"""Instantané binaire colonnaire de la ville scorée, projeté en mémoire au démarrage.
+
+Format d'un fichier ``.snap`` :
+
+- ``MAGIC`` (8 octets), version du format et longueur de l'en-tête (uint32 little-endian) ;
+- un court en-tête JSON : version des données, empreinte des ids, date de création et, pour
+  chaque colonne, son type, sa forme et son décalage dans le fichier ;
+- les colonnes brutes, alignées sur 64 octets. Les colonnes de texte (ids,
+  noms, textes des quartiers) sont stockées en UTF-8 bout à bout avec leurs
+  décalages ; ``id_order`` donne l'ordre trié des ids.
+
+Le chargement projette le fichier entier en lecture seule (``np.memmap``) et
+expose chaque colonne comme une vue, textes compris : rien n'est décodé ni
+indexé au démarrage. Les workers uvicorn démarrent sans recalcul et
+partagent une seule copie des données via le cache de pages.
+"""
+
+import json
+import os
+import struct
+from bisect import bisect_left
+from collections.abc import Sequence
+
+import numpy as np
+
+from metrics import stage
+from scoring import City
+
+MAGIC = b"URBSNAP\0"
+FORMAT_VERSION = 4
+ALIGNMENT = 64
+PREFIX = struct.Struct("<8sII")
+
+COLUMNS = (
+    "raw",
+    "statistics",
+    "criteria",
+    "scores",
+    "rankings",
+    "score_percentiles",
+    "criteria_percentiles",
+    "statistics_percentiles",
+)
+TEXT_COLUMNS = ("ids", "names", "details")
+
+
+class TextColumn(Sequence):
+    """Chaînes UTF-8 stockées bout à bout, décodées une à une à la lecture."""
+
+    def __init__(self, offsets, data):
+        self.offsets = offsets
+        self.data = data
+
+    @staticmethod
+    def encode(strings):
+        """Retourne ``(offsets, data)`` pour une suite de chaînes."""
+        encoded = [s.encode("utf-8") for s in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        return offsets, np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        i = range(len(self))[i]
+        return self.data[self.offsets[i] : self.offsets[i + 1]].tobytes().decode("utf-8")
+
+
+class JsonColumn(TextColumn):
+    """Valeurs JSON stockées comme une colonne de texte."""
+
+    @staticmethod
+    def encode(values):
+        return TextColumn.encode(json.dumps(v, ensure_ascii=False) for v in values)
+
+    def __getitem__(self, i):
+        return json.loads(super().__getitem__(i))
+
+
+class SortedLookup:
+    """Recherche id -> ligne par dichotomie dans l'ordre trié des ids projetés."""
+
+    def __init__(self, ids, order):
+        self.ids = ids
+        self.order = order
+
+    def get(self, neighborhood_id):
+        i = bisect_left(range(len(self.order)), neighborhood_id, key=lambda k: self.ids[self.order[k]])
+        if i < len(self.order) and self.ids[self.order[i]] == neighborhood_id:
+            return int(self.order[i])
+        return None
+
+
+def _align(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+@stage("write_snapshot")
+def write_snapshot(city, path):
+    """Écrit l'instantané de ``city`` dans ``path`` de façon atomique."""
+    arrays = {name: np.ascontiguousarray(getattr(city, name)) for name in COLUMNS}
+    for name in TEXT_COLUMNS:
+        encode = JsonColumn.encode if name == "details" else TextColumn.encode
+        arrays[f"{name}_offsets"], arrays[f"{name}_data"] = encode(getattr(city, name))
+    # Ordre codepoint des ids, identique à l'ordre des octets UTF-8
+    arrays["id_order"] = np.array(sorted(range(len(city)), key=city.ids.__getitem__), dtype=np.int64)
+
+    columns, offset = {}, 0
+    for name, array in arrays.items():
+        columns[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        offset = _align(offset + array.nbytes)
+
+    header = json.dumps(
+        {
+            "version": city.version,
+            "createdAt": city.created_at,
+            "criteriaVersions": list(city.criteria_versions),
+            "datasetId": city.dataset_id,
+            "columns": columns,
+        }
+    ).encode("utf-8")
+    data_start = _align(PREFIX.size + len(header))
+
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(PREFIX.pack(MAGIC, FORMAT_VERSION, len(header)))
+        f.write(header)
+        for name, array in arrays.items():
+            f.seek(data_start + columns[name]["offset"])
+            f.write(array.tobytes())
+        f.truncate(data_start + offset)
+    os.replace(tmp, path)
+
+
+def next_version(path):
+    """Version des données à attribuer au prochain instantané écrit dans ``path``.
+
+    Les versions ne reculent jamais : un rebâtissement complet continue après
+    la version déjà publiée, quel que soit le format de l'instantané existant.
+    """
+    if not os.path.exists(path):
+        return 1
+    with open(path, "rb") as f:
+        magic, _, header_size = PREFIX.unpack(f.read(PREFIX.size))
+        if magic != MAGIC:
+            raise ValueError(f"{path} n'est pas un instantané UrbanScore")
+        return json.loads(f.read(header_size))["version"] + 1
+
+
+@stage("load_snapshot")
+def load_snapshot(path):
+    """Projette un instantané en mémoire (lecture seule) et retourne la ``City`` correspondante."""
+    with open(path, "rb") as f:
+        magic, format_version, header_size = PREFIX.unpack(f.read(PREFIX.size))
+        if magic != MAGIC:
+            raise ValueError(f"{path} n'est pas un instantané UrbanScore")
+        if format_version != FORMAT_VERSION:
+            raise ValueError(f"Format d'instantané non supporté : {format_version}")
+        header = json.loads(f.read(header_size))
+
+    buffer = np.memmap(path, dtype=np.uint8, mode="r")
+    data_start = _align(PREFIX.size + header_size)
+    arrays = {}
+    for name, column in header["columns"].items():
+        dtype = np.dtype(column["dtype"])
+        count = int(np.prod(column["shape"]))
+        start = data_start + column["offset"]
+        arrays[name] = np.asarray(buffer[start : start + count * dtype.itemsize]).view(dtype).reshape(column["shape"])
+
+    ids = TextColumn(arrays["ids_offsets"], arrays["ids_data"])
+    return City(
+        ids=ids,
+        names=TextColumn(arrays["names_offsets"], arrays["names_data"]),
+        details=JsonColumn(arrays["details_offsets"], arrays["details_data"]),
+        positions=SortedLookup(ids, arrays["id_order"]),
+        version=header["version"],
+        created_at=header["createdAt"],
+        criteria_versions=tuple(header["criteriaVersions"]),
+        dataset_id=header["datasetId"],
+        **{name: arrays[name] for name in COLUMNS},
+    )
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from data import NEIGHBORHOODS
+    from scoring import build_city
+
+    parser = argparse.ArgumentParser(description="Score les quartiers et écrit l'instantané binaire.")
+    parser.add_argument("path", help="fichier .snap à écrire")
+    parser.add_argument("--version", type=int, help="version des données (défaut : version publiée + 1)")
+    args = parser.parse_args()
+
+    version = args.version if args.version is not None else next_version(args.path)
+    write_snapshot(build_city(NEIGHBORHOODS, version=version), args.path)
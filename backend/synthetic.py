@@ -0,0 +1,39 @@
+"""Générateur de villes synthétiques pour les bancs d'essai.
+
+Produit des enregistrements au même format que data.NEIGHBORHOODS, avec des
+indicateurs tirés entre les bornes de scoring.INDICATORS.
+"""
+
+import numpy as np
+
+from scoring import BEST, CRITERIA, WORST
+
+# Tailles de référence : arrondissements, secteurs de recensement, cellules de grille
+SIZES = {
+    "boroughs": 4,
+    "tracts": 500,
+    "cells": 50_000,
+}
+
+
+def synthetic_city(size, seed=0):
+    """Retourne ``size`` quartiers synthétiques (``size`` peut être une clé de ``SIZES``)."""
+    count = SIZES.get(size, size)
+    rng = np.random.default_rng(seed)
+    low, high = np.minimum(WORST, BEST), np.maximum(WORST, BEST)
+    indicators = rng.uniform(low, high, size=(count, len(CRITERIA))).round(1)
+    income = rng.normal(60000, 12000, count).clip(20000).round(-2).tolist()
+    population = rng.integers(500, 150_000, count).tolist()
+    stations = rng.poisson(1.5, count).tolist()
+    return [
+        {
+            "id": str(i + 1),
+            "name": f"Secteur {i + 1}",
+            "description": f"Découvrez les informations clés du secteur {i + 1}",
+            "indicators": dict(zip(CRITERIA, row)),
+            "statistics": {"medianIncome": income[i], "population": population[i], "subwayStations": stations[i]},
+            "strengths": [],
+            "weaknesses": [],
+        }
+        for i, row in enumerate(indicators.tolist())
+    ]
@@ -0,0 +1,135 @@
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from cache import LRUCache
+from scoring import CRITERIA, PROFILE_KEYS, PROFILES, SORTS, STATISTICS, build_city
+from synthetic import synthetic_city
+
+
+@pytest.fixture
+def city(monkeypatch):
+    city = build_city(synthetic_city(57))
+    monkeypatch.setattr(main, "city", city)
+    return city
+
+
+@pytest.fixture
+def client():
+    return TestClient(main.app)
+
+
+@pytest.mark.parametrize("profile", PROFILE_KEYS)
+@pytest.mark.parametrize("sort", SORTS)
+def test_cursor_pages_walk_the_full_ranking(city, client, profile, sort):
+    ids, scores, cursor = [], [], None
+    while True:
+        params = {"profile": profile, "sort": sort, "limit": 10}
+        if cursor is not None:
+            params["cursor"] = cursor
+        page = client.get("/quartiers", params=params).json()
+        ids += [item["id"] for item in page["items"]]
+        scores += [city.scores[city.position(item["id"]), PROFILE_KEYS.index(profile)] for item in page["items"]]
+        cursor = page["nextCursor"]
+        if cursor is None:
+            break
+
+    assert sorted(ids) == sorted(city.ids)
+    assert scores == sorted(scores, reverse=sort == "best")
+
+
+@pytest.mark.parametrize("cursor", ["abc", "²", "１", "1-²", "1-999", "-1", "1-"])
+def test_invalid_cursor(city, client, cursor):
+    assert client.get("/quartiers", params={"cursor": cursor}).status_code == 400
+
+
+def test_stale_cursor(city, client, monkeypatch):
+    cursor = client.get("/quartiers", params={"limit": 10}).json()["nextCursor"]
+    monkeypatch.setattr(main, "city", build_city(synthetic_city(57), version=city.version + 1))
+    assert client.get("/quartiers", params={"cursor": cursor}).status_code == 409
+
+
+def test_top_matches_full_sort(city, client):
+    weights = {"security": 3, "transport": 1, "service": 0, "cost": 2, "leisure": 1}
+    items = client.get("/quartiers/top", params={**weights, "k": 7}).json()["items"]
+
+    expected = city.criteria @ np.array(list(weights.values())) / sum(weights.values())
+    order = np.lexsort((np.arange(len(city)), -expected))[:7]
+    assert [item["id"] for item in items] == [city.ids[i] for i in order]
+
+
+def test_top_with_profile_weights_matches_first_page(monkeypatch, client):
+    # Quartiers en double : nombreux ex æquo autour du k-ième score
+    records = synthetic_city(12) * 5
+    for i, record in enumerate(records):
+        records[i] = {**record, "id": str(i + 1)}
+    monkeypatch.setattr(main, "city", build_city(records))
+    weights = dict(zip(CRITERIA, (round(w * 100) for w in PROFILES["global"][1])))
+
+    top = client.get("/quartiers/top", params={**weights, "k": 17}).json()["items"]
+    page = client.get("/quartiers", params={"profile": "global", "limit": 17}).json()["items"]
+
+    assert [item["id"] for item in top] == [item["id"] for item in page]
+
+
+def test_top_reuses_cache_for_nearby_weights(city, client, monkeypatch):
+    monkeypatch.setattr(main, "top_k_cache", LRUCache(maxsize=8))
+    client.get("/quartiers/top", params={"security": 2, "cost": 1})
+    client.get("/quartiers/top", params={"security": 2.001, "cost": 1})
+    client.get("/quartiers/top", params={"security": 2, "cost": 1, "k": 3})
+    assert (main.top_k_cache.hits, main.top_k_cache.misses) == (1, 2)
+
+
+def test_top_cache_not_shared_across_datasets(city, client, monkeypatch):
+    monkeypatch.setattr(main, "top_k_cache", LRUCache(maxsize=8))
+    client.get("/quartiers/top", params={"k": 50})
+    # Même version et mêmes versions de critères, mais un autre jeu de quartiers
+    smaller = build_city(synthetic_city(4))
+    monkeypatch.setattr(main, "city", smaller)
+    response = client.get("/quartiers/top", params={"k": 50})
+    assert response.status_code == 200
+    assert sorted(item["id"] for item in response.json()["items"]) == sorted(smaller.ids)
+    assert main.top_k_cache.misses == 2
+
+
+@pytest.mark.parametrize(
+    "weights",
+    [
+        {"security": "inf"},
+        {"security": "nan"},
+        {"security": 1e308, "transport": 1e308},
+        {"security": 0, "transport": 0, "service": 0, "cost": 0, "leisure": 0},
+        {"security": -1},
+    ],
+)
+def test_top_rejects_invalid_weights(city, client, monkeypatch, weights):
+    monkeypatch.setattr(main, "top_k_cache", LRUCache(maxsize=8))
+    assert client.get("/quartiers/top", params=weights).status_code in (400, 422)
+    assert len(main.top_k_cache) == 0
+
+
+def test_comparison_is_columnar_in_request_order(city, client):
+    ids = ["9", "2", "9", "41"]
+    rows = [city.position(id_) for id_ in ids]
+    payload = client.get("/quartiers/comparaison", params={"ids": ids, "profile": "famille"}).json()
+
+    assert payload["ids"] == ids
+    assert payload["names"] == [city.names[i] for i in rows]
+    assert list(payload["scores"]) == ["score", *CRITERIA]
+    assert list(payload["statistics"]) == list(STATISTICS)
+    assert list(payload["percentiles"]) == ["score", *CRITERIA, *STATISTICS]
+    profile = PROFILE_KEYS.index("famille")
+    assert payload["scores"]["score"] == [round(city.scores[i, profile]) for i in rows]
+    assert payload["scores"]["cost"] == [round(city.criteria[i, CRITERIA.index("cost")]) for i in rows]
+    assert payload["statistics"]["population"] == [round(city.statistics[i, 1]) for i in rows]
+    assert payload["percentiles"]["score"] == [round(city.score_percentiles[i, profile]) for i in rows]
+    assert payload["percentiles"]["medianIncome"] == [round(city.statistics_percentiles[i, 0]) for i in rows]
+
+
+def test_comparison_rejects_unknown_and_too_many_ids(city, client):
+    response = client.get("/quartiers/comparaison", params={"ids": ["3", "inconnu", "x"]})
+    assert response.status_code == 404
+    assert "inconnu, x" in response.json()["detail"]
+    assert client.get("/quartiers/comparaison", params={"ids": ["1"] * 20}).status_code == 200
+    assert client.get("/quartiers/comparaison", params={"ids": ["1"] * 21}).status_code == 422
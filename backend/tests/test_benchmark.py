@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+
+from benchmark import isolated, regressions
+
+
+def allocate(megabytes):
+    block = np.ones(megabytes * 1024**2 // 8)
+    return {"total": float(block.sum())}
+
+
+def test_isolated_reports_the_measurement_growth():
+    small, large = isolated(allocate, 1), isolated(allocate, 64)
+    assert large["total"] == 64 * 1024**2 // 8
+    assert large["rss_delta_mb"] >= 60 > small["rss_delta_mb"]
+
+
+def test_isolated_propagates_failures():
+    with pytest.raises(RuntimeError, match="ZeroDivisionError"):
+        isolated(lambda: 1 / 0)
+
+
+def test_regressions():
+    baseline = {"size": 500, "api": {"top": {"p95_ms": 10.0}, "detail": {"p95_ms": 10.0}}}
+    results = {"size": 500, "api": {"top": {"p95_ms": 13.0}, "detail": {"p95_ms": 11.0}}}
+    assert [line.split(" ")[0] for line in regressions(results, baseline)] == ["api/top"]
+    with pytest.raises(ValueError):
+        regressions({**results, "size": 4}, baseline)
@@ -0,0 +1,23 @@
+from cache import LRUCache
+
+
+def test_hit_does_not_recompute():
+    cache = LRUCache(maxsize=2)
+    calls = []
+    assert cache.get("a", lambda: calls.append("a") or 1) == 1
+    assert cache.get("a", lambda: calls.append("a") or 2) == 1
+    assert calls == ["a"]
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2)
+    cache.get("a", lambda: 1)
+    cache.get("b", lambda: 2)
+    cache.get("a", lambda: 1)  # "b" devient la moins récemment lue
+    cache.get("c", lambda: 3)
+
+    assert len(cache) == 2
+    assert cache.get("b", lambda: "recalculé") == "recalculé"
+    assert cache.get("c", lambda: "recalculé") == 3
+    assert (cache.hits, cache.misses) == (2, 4)
@@ -0,0 +1,83 @@
+import json
+
+import numpy as np
+import pytest
+
+from crime import CrimeCounts, GridIndex, contains, count_incidents, load_polygons
+from pipeline import refresh
+from scoring import CRITERIA, build_city
+from synthetic import synthetic_city
+
+
+def polygons(rng, count=12):
+    """Polygones convexes irréguliers qui se chevauchent, plus un carré troué."""
+    result = []
+    for _ in range(count):
+        center = rng.uniform(0, 10, 2)
+        angles = np.sort(rng.uniform(0, 2 * np.pi, 7))
+        radii = rng.uniform(0.5, 2.0, 7)
+        result.append([center + np.column_stack([np.cos(angles), np.sin(angles)]) * radii[:, None]])
+    square = np.array([[2.0, 2.0], [8.0, 2.0], [8.0, 8.0], [2.0, 8.0]])
+    hole = np.array([[4.0, 4.0], [6.0, 4.0], [6.0, 6.0], [4.0, 6.0]])
+    result.append([square, hole])
+    return result
+
+
+def test_locate_matches_brute_force():
+    rng = np.random.default_rng(0)
+    shapes = polygons(rng)
+    x, y = rng.uniform(-1, 11, (2, 20_000))
+
+    located = GridIndex(shapes, cells=16).locate(x, y)
+
+    # Référence : chaque point testé contre chaque polygone, le premier gagne
+    inside = np.array([contains(rings, x, y) for rings in shapes])
+    expected = np.where(inside.any(axis=0), inside.argmax(axis=0), -1)
+    np.testing.assert_array_equal(located, expected)
+
+
+def test_hole_is_outside():
+    shapes = polygons(np.random.default_rng(1), count=0)
+    located = GridIndex(shapes).locate(np.array([5.0, 3.0]), np.array([5.0, 3.0]))
+    np.testing.assert_array_equal(located, [-1, 0])
+
+
+def test_count_incidents_over_covered_period(tmp_path):
+    square = [[[0, 0], [1, 0], [1, 1], [0, 1], [0, 0]]]
+    geojson = {
+        "type": "FeatureCollection",
+        "features": [{"type": "Feature", "properties": {"id": "A"}, "geometry": {"type": "Polygon", "coordinates": square}}],
+    }
+    (tmp_path / "q.geojson").write_text(json.dumps(geojson))
+    (tmp_path / "c.csv").write_text(
+        "CATEGORIE,DATE,LONGITUDE,LATITUDE\n"
+        "Méfait,2022-01-01,0.5,0.5\n"
+        "Introduction,2022-07-02,0.5,0.5\n"
+        "Méfait,2023-12-31,0.5,0.5\n"
+        # Hors des quartiers ou sans position : ni compté, ni pris en compte dans la période
+        "Méfait,2019-01-01,5,5\n"
+        "Méfait,2025-01-01,0,0\n"
+    )
+
+    result = count_incidents(tmp_path / "c.csv", *load_polygons(tmp_path / "q.geojson"), chunk_size=2)
+
+    assert result.categories == ("Méfait", "Introduction")
+    np.testing.assert_array_equal(result.counts, [[2, 1]])
+    assert result.years == 730 / 365.25
+    np.testing.assert_allclose(result.per_thousand([1000]), [3 / (730 / 365.25)])
+
+
+def test_refresh_values_feed_security():
+    records = synthetic_city(3)
+    records[0]["statistics"]["population"] = 2000
+    records[2]["statistics"]["population"] = 0
+    city = build_city(records)
+    counts = CrimeCounts(ids=("1", "3"), categories=("Méfait",), counts=np.array([[80], [5]]), years=2.0)
+
+    values = counts.refresh_values(city)
+
+    assert values == {"security": {"1": 20.0}}
+    refreshed = refresh(city, "crime", values)
+    assert refreshed.raw[0, CRITERIA.index("security")] == 20.0
+    with pytest.raises(ValueError):
+        CrimeCounts(ids=("inconnu",), categories=(), counts=np.zeros((1, 0)), years=1.0).refresh_values(city)
@@ -0,0 +1,25 @@
+import os
+
+from fastapi.testclient import TestClient
+
+import main
+from metrics import STAGE_SECONDS
+
+
+def serialized():
+    counts, _ = STAGE_SECONDS._series.get(("serialize",), ([0], 0.0))
+    return sum(counts)
+
+
+def test_serialize_stage_covers_every_json_endpoint():
+    client = TestClient(main.app)
+    before = serialized()
+    for url in ("/quartiers", "/quartiers/top", "/quartiers/comparaison?ids=1&ids=2", "/quartiers/1"):
+        assert client.get(url).status_code == 200
+    assert serialized() == before + 4
+
+
+def test_metrics_identify_the_worker():
+    text = TestClient(main.app).get("/metrics").text
+    assert f'urbanscore_worker_info{{pid="{os.getpid()}"}} 1' in text
+    assert 'urbanscore_stage_duration_seconds_count{stage="serialize"}' in text
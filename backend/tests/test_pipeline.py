@@ -0,0 +1,55 @@
+import copy
+
+import numpy as np
+import pytest
+
+from pipeline import PER_CAPITA, refresh
+from scoring import CRITERIA, build_city
+from snapshot import COLUMNS
+from synthetic import synthetic_city
+
+UPDATES = {
+    "crime": {"security": {"3": 42.0, "17": 1.5}},
+    "transit": {"transport": {"5": 3.0}, "subwayStations": {"5": 4, "8": 0}},
+    "services": {"service": {"1": 0.2, "40": 9.9}},
+    "census": {"population": {"2": 1000, "9": 250_000}, "medianIncome": {"9": 91000}},
+}
+
+
+def assert_same_city(city, expected):
+    for name in COLUMNS:
+        np.testing.assert_allclose(getattr(city, name), getattr(expected, name), err_msg=name)
+
+
+@pytest.mark.parametrize("source", sorted(UPDATES))
+def test_refresh_matches_full_rebuild(source):
+    records = synthetic_city(60)
+    city = build_city(records)
+
+    expected = copy.deepcopy(records)
+    for column, updates in UPDATES[source].items():
+        for id_, value in updates.items():
+            record = expected[int(id_) - 1]
+            if column == "population":
+                # Les indicateurs par habitant gardent leur numérateur
+                for criterion in PER_CAPITA:
+                    record["indicators"][criterion] *= record["statistics"]["population"] / value
+            group = "statistics" if column in record["statistics"] else "indicators"
+            record[group][column] = value
+
+    refreshed = refresh(city, source, UPDATES[source])
+
+    assert_same_city(refreshed, build_city(expected))
+    assert refreshed.version == city.version + 1
+
+
+def test_refresh_only_bumps_touched_criteria():
+    city = build_city(synthetic_city(20))
+    refreshed = refresh(city, "census", {"medianIncome": {"1": 50000}})
+    assert refreshed.criteria_versions == city.criteria_versions
+    assert refreshed.criteria is city.criteria
+
+    refreshed = refresh(city, "census", {"population": {"1": 5000}})
+    assert dict(zip(CRITERIA, refreshed.criteria_versions)) == {
+        criterion: 2 if criterion in PER_CAPITA else 1 for criterion in CRITERIA
+    }
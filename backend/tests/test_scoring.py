@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+from data import NEIGHBORHOODS
+from scoring import BEST, CRITERIA, PROFILES, WEIGHTS, WORST, build_city, normalize, percentile_ranks, rank, score, top_k
+
+# Scores par critère codés en dur dans le frontend (components/RankingList.tsx)
+FRONTEND_CRITERIA = {
+    "1": {"security": 96, "transport": 81, "service": 78, "cost": 82, "leisure": 83},
+    "2": {"security": 78, "transport": 81, "service": 85, "cost": 50, "leisure": 75},
+    "3": {"security": 88, "transport": 84, "service": 82, "cost": 75, "leisure": 80},
+    "4": {"security": 85, "transport": 80, "service": 78, "cost": 65, "leisure": 70},
+}
+
+
+@pytest.mark.parametrize("criterion", ["security", "cost"])
+def test_normalize_inverted_criteria(criterion):
+    j = CRITERIA.index(criterion)
+    worst, best = WORST[j], BEST[j]
+    assert worst > best
+    raw = np.array([worst, best, (worst + best) / 2, worst + 10, best - 10])
+    np.testing.assert_allclose(normalize(raw[:, None], [j])[:, 0], [0.0, 1.0, 0.5, 0.0, 1.0])
+
+
+def test_normalize_clips_at_bounds():
+    normalized = normalize(np.vstack([WORST + (WORST - BEST), BEST, WORST, BEST + (BEST - WORST)]))
+    np.testing.assert_array_equal(normalized, [[0.0] * 5, [1.0] * 5, [0.0] * 5, [1.0] * 5])
+
+
+@pytest.mark.parametrize("profile", list(PROFILES))
+def test_score_is_the_weighted_sum(profile):
+    raw = np.array([[60.0, 25.0, 5.0, 1800.0, 10.0], [20.0, 50.0, 20.0, 1000.0, 40.0]])
+    _, weights = PROFILES[profile]
+    expected = [
+        100 * sum(w * (r - lo) / (hi - lo) for w, r, lo, hi in zip(weights, row, WORST, BEST)) / sum(weights)
+        for row in raw
+    ]
+    _, scores = score(raw)
+    np.testing.assert_allclose(scores[:, list(PROFILES).index(profile)], expected)
+    np.testing.assert_allclose(scores[1], 100.0)
+
+
+def test_rank_breaks_ties_by_row():
+    scores = np.array([[50.0], [70.0], [50.0], [70.0], [10.0]])
+    best, worst = rank(scores)[:, 0]
+    assert best.tolist() == [1, 3, 0, 2, 4]
+    assert worst.tolist() == [4, 0, 2, 1, 3]
+
+
+def test_neighborhoods_match_frontend_scores():
+    city = build_city(NEIGHBORHOODS)
+    for id_, expected in FRONTEND_CRITERIA.items():
+        row = city.criteria[city.position(id_)].round().astype(int)
+        assert dict(zip(CRITERIA, row.tolist())) == expected
+    np.testing.assert_allclose(city.scores, city.criteria @ WEIGHTS.T)
+
+
+def test_top_k_keeps_lowest_rows_among_ties():
+    rng = np.random.default_rng(5)
+    for _ in range(200):
+        criteria = rng.integers(0, 4, (40, len(CRITERIA))).astype(np.float64)
+        weights = rng.integers(0, 3, len(CRITERIA)) + (np.arange(len(CRITERIA)) == 0)
+        rows, scores = top_k(criteria, weights, 7)
+        full = criteria @ (weights / weights.sum())
+        np.testing.assert_array_equal(rows, np.lexsort((np.arange(40), -full))[:7])
+
+
+def test_percentile_ranks_share_at_or_below():
+    values = np.array([[3.0, 1.0], [1.0, 1.0], [3.0, 2.0], [2.0, 1.0], [5.0, 1.0]])
+    expected = [[100 * np.mean(values[:, j] <= v) for j, v in enumerate(row)] for row in values]
+    np.testing.assert_allclose(percentile_ranks(values), expected)
+    np.testing.assert_allclose(percentile_ranks(values)[:, 0], [80, 20, 80, 40, 100])
+    assert percentile_ranks(np.empty((0, 2))).shape == (0, 2)
@@ -0,0 +1,33 @@
+import numpy as np
+
+from snapshot import COLUMNS, load_snapshot, next_version, write_snapshot
+from scoring import build_city
+from synthetic import synthetic_city
+
+
+def test_round_trip(tmp_path):
+    records = synthetic_city(200)
+    records[3]["name"] = "Côte-des-Neiges–Notre-Dame-de-Grâce"
+    records[3]["strengths"] = ["Université", "Oratoire Saint-Joseph"]
+    city = build_city(records, version=7)
+    write_snapshot(city, tmp_path / "city.snap")
+
+    loaded = load_snapshot(tmp_path / "city.snap")
+
+    assert loaded.version == 7
+    assert list(loaded.ids) == list(city.ids)
+    assert list(loaded.names) == list(city.names)
+    assert loaded.details[3] == city.details[3]
+    for name in COLUMNS:
+        np.testing.assert_array_equal(getattr(loaded, name), getattr(city, name))
+        assert not getattr(loaded, name).flags.writeable
+    assert all(loaded.position(id_) == i for i, id_ in enumerate(city.ids))
+    assert loaded.position("inconnu") is None
+    assert loaded.position("") is None
+
+
+def test_versions_continue_after_published_snapshot(tmp_path):
+    path = tmp_path / "city.snap"
+    assert next_version(path) == 1
+    write_snapshot(build_city(synthetic_city(10), version=5), path)
+    assert next_version(path) == 6
@@ -0,0 +1,178 @@
+import datetime
+
+import numpy as np
+import pytest
+
+from transit import (
+    EARTH_RADIUS,
+    REFERENCE_LATITUDE,
+    StopIndex,
+    Stops,
+    active_services,
+    load_stops,
+    polygon_area_km2,
+    project,
+    sample_points,
+    transit_access,
+)
+
+
+@pytest.fixture
+def stops():
+    # Coordonnées projetées réalistes (Montréal : x ~ -5,2e6 m, y ~ 5,06e6 m)
+    rng = np.random.default_rng(3)
+    x = rng.uniform(-5.21e6, -5.20e6, 400)
+    y = rng.uniform(5.06e6, 5.07e6, 400)
+    return x, y
+
+
+def queries(n=300):
+    rng = np.random.default_rng(4)
+    return rng.uniform(-5.212e6, -5.198e6, n), rng.uniform(5.058e6, 5.072e6, n)
+
+
+def test_grid_covers_only_the_stops(stops):
+    index = StopIndex(*stops)
+    assert np.all(index.shape <= np.ceil(1e4 / index.cell_size) + 1)
+
+
+def test_within_matches_pairwise_distances(stops):
+    index = StopIndex(*stops)
+    qx, qy = queries()
+    distances = np.hypot(qx[:, None] - stops[0], qy[:, None] - stops[1])
+    weights = np.arange(len(stops[0]), dtype=np.float64)
+
+    np.testing.assert_array_equal(index.within(qx, qy, 700.0), (distances <= 700.0).sum(axis=1))
+    np.testing.assert_allclose(index.within(qx, qy, 500.0, weights=weights), (distances <= 500.0) @ weights)
+
+
+def test_nearest_matches_pairwise_distances(stops):
+    index = StopIndex(*stops)
+    qx, qy = queries()
+    distances = np.hypot(qx[:, None] - stops[0], qy[:, None] - stops[1])
+
+    best, nearest = index.nearest(qx, qy, max_distance=800.0)
+
+    expected = distances.min(axis=1)
+    reachable = expected <= 800.0
+    np.testing.assert_allclose(best[reachable], expected[reachable])
+    np.testing.assert_array_equal(nearest[reachable], distances.argmin(axis=1)[reachable])
+    assert np.all(np.isinf(best[~reachable])) and np.all(nearest[~reachable] == -1)
+
+
+def write(path, header, *rows):
+    path.write_text("\n".join([header, *rows]) + "\n", encoding="utf-8")
+
+
+@pytest.fixture
+def gtfs(tmp_path):
+    write(
+        tmp_path / "calendar.txt",
+        "service_id,monday,tuesday,wednesday,thursday,friday,saturday,sunday,start_date,end_date",
+        "semaine_hiver,1,1,1,1,1,0,0,20260105,20260329",
+        "semaine_ete,1,1,1,1,1,0,0,20260622,20260830",
+        "samedi,0,0,0,0,0,1,0,20260105,20260830",
+    )
+    write(
+        tmp_path / "calendar_dates.txt",
+        "service_id,date,exception_type",
+        "semaine_hiver,20260216,2",
+        "samedi,20260216,1",
+    )
+    write(tmp_path / "stops.txt", "stop_id,stop_lon,stop_lat,location_type,parent_station", "A,-73.6,45.5,0,")
+    write(tmp_path / "routes.txt", "route_id,route_type", "10,3")
+    write(tmp_path / "trips.txt", "trip_id,route_id,service_id", "h,10,semaine_hiver", "e,10,semaine_ete", "s,10,samedi")
+    write(tmp_path / "stop_times.txt", "trip_id,stop_id", "h,A", "h,A", "e,A", "s,A")
+    return tmp_path
+
+
+def test_active_services(gtfs):
+    assert active_services(gtfs, datetime.date(2026, 2, 10)) == {"semaine_hiver"}
+    assert active_services(gtfs, datetime.date(2026, 7, 7)) == {"semaine_ete"}
+    # Jour férié : le service de semaine est remplacé par l'horaire du samedi
+    assert active_services(gtfs, datetime.date(2026, 2, 16)) == {"samedi"}
+    with pytest.raises(ValueError):
+        active_services(gtfs, datetime.date(2026, 4, 5))
+
+
+def test_departures_counted_for_reference_date(gtfs):
+    assert load_stops(gtfs, datetime.date(2026, 2, 10)).departures.tolist() == [2]
+    assert load_stops(gtfs, datetime.date(2026, 7, 7)).departures.tolist() == [1]
+
+
+DEGREES_LAT = 1 / (np.pi / 180.0 * EARTH_RADIUS)
+DEGREES_LON = DEGREES_LAT / np.cos(np.radians(REFERENCE_LATITUDE))
+
+
+def square(east, north, size):
+    """Carré de ``size`` m dont le coin sud-ouest est à (``east``, ``north``) m d'un point de Montréal."""
+    lon, lat = -73.6 + east * DEGREES_LON, 45.5 + north * DEGREES_LAT
+    w, h = size * DEGREES_LON, size * DEGREES_LAT
+    return np.array([[lon, lat], [lon + w, lat], [lon + w, lat + h], [lon, lat + h], [lon, lat]])
+
+
+def test_polygon_area_with_hole():
+    assert polygon_area_km2([square(0, 0, 1000)]) == pytest.approx(1.0)
+    assert polygon_area_km2([square(0, 0, 1000), square(250, 250, 500)]) == pytest.approx(0.75)
+
+
+def stops_at(points):
+    """Arrêts ``(id, est, nord, station, passages, métro)`` en mètres du point de référence."""
+    ids, east, north, stations, departures, metro = zip(*points)
+    return Stops(
+        ids=ids,
+        lon=-73.6 + np.array(east) * DEGREES_LON,
+        lat=45.5 + np.array(north) * DEGREES_LAT,
+        stations=stations,
+        departures=np.array(departures),
+        metro=np.array(metro),
+    )
+
+
+def test_transit_access():
+    polygons = [
+        [square(0, 0, 1000)],
+        [square(1000, 0, 1000)],
+        # Loin de tout arrêt
+        [square(30_000, 0, 1000)],
+        # Plus petit qu'une cellule d'échantillonnage : aucun point
+        [square(-500, 0, 20)],
+    ]
+    stops = stops_at(
+        [
+            # Deux quais de la même station de métro
+            ("q1", 300, 500, "S1", 100, True),
+            ("q2", 320, 500, "S1", 100, True),
+            ("b1", 700, 200, "b1", 40, False),
+            ("q3", 1500, 500, "q3", 80, True),
+            ("b2", -490, 10, "b2", 10, False),
+        ]
+    )
+
+    access = transit_access(stops, ["A", "B", "C", "D"], polygons)
+
+    np.testing.assert_allclose(access.stops_per_km2, [3, 1, 0, 1 / 0.0004], rtol=1e-6)
+    assert access.subway_stations.tolist() == [1, 1, 0, 0]
+
+    # Référence : moyennes directes sur les points d'échantillonnage
+    lon, lat, owner = sample_points(polygons)
+    qx, qy = project(lon, lat)
+    sx, sy = project(stops.lon, stops.lat)
+    distances = np.hypot(qx[:, None] - sx, qy[:, None] - sy)
+    for p in range(2):
+        mine = owner == p
+        assert access.mean_nearest_stop[p] == pytest.approx(distances[mine].min(axis=1).mean())
+        assert access.mean_stops_within[p] == pytest.approx((distances[mine] <= 500).sum(axis=1).mean())
+        assert access.mean_departures_within[p] == pytest.approx(((distances[mine] <= 500) @ stops.departures).mean())
+
+    # Injoignable ou sans point : pas de moyenne plutôt qu'une distance nulle
+    assert np.isnan(access.mean_nearest_stop[2:]).all()
+    assert access.mean_stops_within[2] == 0 and np.isnan(access.mean_stops_within[3])
+    assert access.measures()["C"]["nearestStopM"] is None
+
+
+def test_transit_access_without_stops():
+    stops = Stops(ids=(), lon=np.empty(0), lat=np.empty(0), stations=(), departures=np.empty(0), metro=np.empty(0, bool))
+    access = transit_access(stops, ["A", "B"], [[square(0, 0, 1000)], [square(2000, 0, 1000)]])
+    assert np.isnan(access.mean_nearest_stop).all()
+    assert access.refresh_values()["transport"] == {"A": 0.0, "B": 0.0}
@@ -0,0 +1,374 @@
+"""Accessibilité au transport collectif (métro et bus STM) à partir d'un flux GTFS.
+
+Les arrêts sont projetés en mètres puis rangés dans un index en grille dont
+la cellule mesure le rayon de marche. Toutes les requêtes (arrêt le plus
+proche, arrêts à distance de marche, passages desservis) sont vectorisées
+sur l'ensemble des points d'échantillonnage : aucune boucle point x arrêt.
+
+La densité d'arrêts (aire réelle des polygones) alimente le critère
+``transport`` et la statistique ``subwayStations`` (source ``transit`` de
+pipeline.py). Les points d'échantillonnage couvrent chaque quartier sur une
+grille fine ; leurs moyennes par quartier (distance à l'arrêt le plus proche,
+arrêts et passages à distance de marche) sont exposées par
+``TransitAccess.measures``.
+"""
+
+import csv
+import datetime
+import json
+import os
+from dataclasses import dataclass
+from itertools import islice
+
+import numpy as np
+
+from crime import CHUNK_SIZE, GridIndex, contains
+from metrics import stage
+
+WALK_RADIUS = 500.0
+SAMPLE_SPACING = 100.0
+EARTH_RADIUS = 6_371_000.0
+# Latitude de référence de la projection équirectangulaire (Montréal)
+REFERENCE_LATITUDE = 45.5
+METRO_ROUTE_TYPE = "1"
+WEEKDAYS = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+
+
+def project(lon, lat):
+    """Projette des degrés en mètres ; la déformation est négligeable à l'échelle de l'île."""
+    scale = np.pi / 180.0 * EARTH_RADIUS
+    return (
+        np.asarray(lon) * scale * np.cos(np.radians(REFERENCE_LATITUDE)),
+        np.asarray(lat) * scale,
+    )
+
+
+def _rows(path, columns):
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        indices = [header.index(c) if c in header else None for c in columns]
+        while chunk := list(islice(reader, CHUNK_SIZE)):
+            yield [[r[i] if i is not None else "" for i in indices] for r in chunk]
+
+
+@dataclass(frozen=True)
+class Stops:
+    """Arrêts du flux GTFS, sous forme colonnaire."""
+
+    ids: tuple
+    lon: np.ndarray
+    lat: np.ndarray
+    stations: tuple
+    departures: np.ndarray
+    metro: np.ndarray
+
+
+def active_services(gtfs_dir, date):
+    """Services GTFS en vigueur à ``date`` (``datetime.date``), ou ``None`` sans calendrier.
+
+    ``calendar.txt`` donne les services réguliers (jour de semaine et période
+    ``start_date``..``end_date``) ; ``calendar_dates.txt`` ajoute
+    (``exception_type`` 1) ou retire (2) un service pour une date précise.
+    """
+    calendar = os.path.join(gtfs_dir, "calendar.txt")
+    calendar_dates = os.path.join(gtfs_dir, "calendar_dates.txt")
+    if not os.path.exists(calendar) and not os.path.exists(calendar_dates):
+        return None
+    # Les dates GTFS (AAAAMMJJ) se comparent comme des chaînes
+    day = date.strftime("%Y%m%d")
+    services = set()
+    if os.path.exists(calendar):
+        columns = ("service_id", WEEKDAYS[date.weekday()], "start_date", "end_date")
+        services = {
+            service
+            for chunk in _rows(calendar, columns)
+            for service, runs, start, end in chunk
+            if runs == "1" and start <= day <= end
+        }
+    if os.path.exists(calendar_dates):
+        for chunk in _rows(calendar_dates, ("service_id", "date", "exception_type")):
+            for service, exception_date, exception_type in chunk:
+                if exception_date != day:
+                    continue
+                if exception_type == "1":
+                    services.add(service)
+                elif exception_type == "2":
+                    services.discard(service)
+    if not services:
+        raise ValueError(f"Aucun service GTFS en vigueur le {date.isoformat()}")
+    return services
+
+
+@stage("ingest_gtfs")
+def load_stops(gtfs_dir, date=None):
+    """Lit les arrêts et leurs passages à la date de référence ``date`` (défaut : aujourd'hui).
+
+    ``stop_times.txt`` (plusieurs millions de lignes) est lu par blocs ; seuls
+    les compteurs par arrêt restent en mémoire.
+    """
+    stop_rows = [
+        row
+        for chunk in _rows(
+            os.path.join(gtfs_dir, "stops.txt"), ("stop_id", "stop_lon", "stop_lat", "location_type", "parent_station")
+        )
+        for row in chunk
+        # Les gares (location_type = 1) regroupent des quais, qui sont les vrais arrêts
+        if row[3] in ("", "0")
+    ]
+    ids = tuple(r[0] for r in stop_rows)
+    positions = {id_: i for i, id_ in enumerate(ids)}
+
+    metro_routes = {
+        route_id
+        for chunk in _rows(os.path.join(gtfs_dir, "routes.txt"), ("route_id", "route_type"))
+        for route_id, route_type in chunk
+        if route_type == METRO_ROUTE_TYPE
+    }
+    services = active_services(gtfs_dir, date or datetime.date.today())
+    trips = {
+        trip_id: route_id in metro_routes
+        for chunk in _rows(os.path.join(gtfs_dir, "trips.txt"), ("trip_id", "route_id", "service_id"))
+        for trip_id, route_id, service_id in chunk
+        if services is None or service_id in services
+    }
+
+    departures = np.zeros(len(ids), dtype=np.int64)
+    metro = np.zeros(len(ids), dtype=bool)
+    for chunk in _rows(os.path.join(gtfs_dir, "stop_times.txt"), ("trip_id", "stop_id")):
+        kept = [
+            (positions[stop_id], trips[trip_id])
+            for trip_id, stop_id in chunk
+            if trip_id in trips and stop_id in positions
+        ]
+        if not kept:
+            continue
+        stop, is_metro = np.array(kept).T
+        departures += np.bincount(stop, minlength=len(ids))
+        metro[stop[is_metro.astype(bool)]] = True
+
+    return Stops(
+        ids=ids,
+        lon=np.array([r[1] for r in stop_rows], dtype=np.float64),
+        lat=np.array([r[2] for r in stop_rows], dtype=np.float64),
+        # Une station de métro compte une fois, quel que soit son nombre de quais
+        stations=tuple(r[4] or r[0] for r in stop_rows),
+        departures=departures,
+        metro=metro,
+    )
+
+
+class StopIndex:
+    """Index en grille sur des points projetés en mètres (cellules carrées de ``cell_size``)."""
+
+    def __init__(self, x, y, cell_size=WALK_RADIUS):
+        self.x, self.y = np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64)
+        self.cell_size = cell_size
+        self.origin = np.array([self.x.min(), self.y.min()]) if len(self.x) else np.zeros(2)
+        cells = self._cells(self.x, self.y)
+        self.shape = cells.max(axis=0, initial=0) + 1
+        cell_ids = cells[:, 1] * self.shape[0] + cells[:, 0]
+        self.order = np.argsort(cell_ids, kind="stable")
+        self.indptr = np.zeros(self.shape.prod() + 1, dtype=np.int64)
+        np.cumsum(np.bincount(cell_ids, minlength=self.shape.prod()), out=self.indptr[1:])
+
+    def _cells(self, x, y):
+        return np.floor((np.column_stack([x, y]) - self.origin) / self.cell_size).astype(np.int64)
+
+    def _pairs(self, cells, offsets):
+        """Paires (requête, arrêt) des cellules ``cells + offset`` pour chaque décalage."""
+        queries, stops = [np.empty(0, dtype=np.int64)], [np.empty(0, dtype=np.int64)]
+        for offset in offsets:
+            target = cells + offset
+            valid = np.all((target >= 0) & (target < self.shape), axis=1)
+            cell_ids = target[valid, 1] * self.shape[0] + target[valid, 0]
+            starts = self.indptr[cell_ids]
+            counts = self.indptr[cell_ids + 1] - starts
+            offsets_in_cell = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+            queries.append(np.repeat(np.flatnonzero(valid), counts))
+            stops.append(self.order[np.repeat(starts, counts) + offsets_in_cell])
+        return np.concatenate(queries), np.concatenate(stops)
+
+    def _distances(self, qx, qy, queries, stops):
+        return np.hypot(qx[queries] - self.x[stops], qy[queries] - self.y[stops])
+
+    def within(self, qx, qy, radius=WALK_RADIUS, weights=None):
+        """Nombre (ou somme des ``weights``) d'arrêts à moins de ``radius`` de chaque requête."""
+        reach = int(np.ceil(radius / self.cell_size))
+        offsets = [(dx, dy) for dx in range(-reach, reach + 1) for dy in range(-reach, reach + 1)]
+        queries, stops = self._pairs(self._cells(qx, qy), offsets)
+        close = self._distances(qx, qy, queries, stops) <= radius
+        values = None if weights is None else np.asarray(weights, dtype=np.float64)[stops[close]]
+        return np.bincount(queries[close], weights=values, minlength=len(qx))
+
+    def nearest(self, qx, qy, max_distance=5000.0):
+        """Distance et indice de l'arrêt le plus proche (``inf`` et -1 au-delà de ``max_distance``).
+
+        La recherche s'étend anneau de cellules par anneau de cellules ; une
+        requête est résolue dès que sa meilleure distance ne peut plus être
+        battue par un anneau plus éloigné.
+        """
+        cells = self._cells(qx, qy)
+        best = np.full(len(qx), np.inf)
+        nearest = np.full(len(qx), -1, dtype=np.int64)
+        pending = np.arange(len(qx))
+        for ring in range(int(np.ceil(max_distance / self.cell_size)) + 1):
+            if not len(pending):
+                break
+            offsets = [
+                (dx, dy)
+                for dx in range(-ring, ring + 1)
+                for dy in range(-ring, ring + 1)
+                if max(abs(dx), abs(dy)) == ring
+            ]
+            local, stops = self._pairs(cells[pending], offsets)
+            queries = pending[local]
+            distances = self._distances(qx, qy, queries, stops)
+            # Minimum par requête : tri par (requête, distance), premier de chaque groupe
+            order = np.lexsort((distances, queries))
+            first = order[np.r_[True, queries[order][1:] != queries[order][:-1]]] if len(order) else order
+            improved = distances[first] < best[queries[first]]
+            best[queries[first][improved]] = distances[first][improved]
+            nearest[queries[first][improved]] = stops[first][improved]
+            pending = pending[best[pending] > ring * self.cell_size]
+        too_far = best > max_distance
+        best[too_far], nearest[too_far] = np.inf, -1
+        return best, nearest
+
+
+def polygon_area_km2(rings):
+    """Aire projetée (km²) d'un polygone ; un anneau contenu dans un nombre impair d'autres est un trou."""
+    area = 0.0
+    for i, ring in enumerate(rings):
+        x, y = project(ring[:, 0] - ring[0, 0], ring[:, 1] - ring[0, 1])
+        shoelace = abs(np.dot(x, np.roll(y, -1)) - np.dot(y, np.roll(x, -1))) / 2
+        depth = sum(contains([other], ring[:1, 0], ring[:1, 1])[0] for j, other in enumerate(rings) if j != i)
+        area += -shoelace if depth % 2 else shoelace
+    return area / 1e6
+
+
+def sample_points(polygons, spacing=SAMPLE_SPACING):
+    """Grille de points espacés de ``spacing`` mètres à l'intérieur de chaque polygone.
+
+    Retourne ``(lon, lat, owner)`` où ``owner`` est l'indice du polygone.
+    """
+    step_lat = spacing / (np.pi / 180.0 * EARTH_RADIUS)
+    step_lon = step_lat / np.cos(np.radians(REFERENCE_LATITUDE))
+    lon, lat, owner = [], [], []
+    for p, rings in enumerate(polygons):
+        low, high = np.vstack(rings).min(axis=0), np.vstack(rings).max(axis=0)
+        gx, gy = np.meshgrid(
+            np.arange(low[0] + step_lon / 2, high[0], step_lon),
+            np.arange(low[1] + step_lat / 2, high[1], step_lat),
+        )
+        gx, gy = gx.ravel(), gy.ravel()
+        inside = contains(rings, gx, gy)
+        lon.append(gx[inside])
+        lat.append(gy[inside])
+        owner.append(np.full(inside.sum(), p))
+    return np.concatenate(lon), np.concatenate(lat), np.concatenate(owner)
+
+
+@dataclass(frozen=True)
+class TransitAccess:
+    """Indicateurs d'accessibilité par quartier.
+
+    Les moyennes valent ``nan`` pour un quartier sans point d'échantillonnage
+    (ou, pour la distance, sans arrêt à moins de la distance maximale).
+    """
+
+    ids: tuple
+    stops_per_km2: np.ndarray
+    subway_stations: np.ndarray
+    mean_nearest_stop: np.ndarray
+    mean_stops_within: np.ndarray
+    mean_departures_within: np.ndarray
+
+    def refresh_values(self):
+        """Valeurs de la source ``transit`` au format attendu par ``pipeline.refresh``."""
+        measured = np.isfinite(self.stops_per_km2)
+        return {
+            "transport": {id_: v for id_, v, m in zip(self.ids, self.stops_per_km2.tolist(), measured) if m},
+            "subwayStations": dict(zip(self.ids, self.subway_stations.tolist())),
+        }
+
+    def measures(self):
+        """Moyennes d'accessibilité par quartier (``None`` quand elles ne sont pas définies)."""
+        columns = {
+            "nearestStopM": self.mean_nearest_stop,
+            "stopsWithin": self.mean_stops_within,
+            "departuresWithin": self.mean_departures_within,
+        }
+        return {
+            id_: {name: float(values[i]) if np.isfinite(values[i]) else None for name, values in columns.items()}
+            for i, id_ in enumerate(self.ids)
+        }
+
+
+@stage("transit_access")
+def transit_access(stops, ids, polygons, radius=WALK_RADIUS, spacing=SAMPLE_SPACING):
+    """Calcule l'accessibilité de chaque quartier à partir d'une grille de points d'échantillonnage."""
+    index = StopIndex(*project(stops.lon, stops.lat), cell_size=radius)
+    lon, lat, owner = sample_points(polygons, spacing)
+    qx, qy = project(lon, lat)
+
+    nearest, _ = index.nearest(qx, qy)
+    within = index.within(qx, qy, radius)
+    departures = index.within(qx, qy, radius, weights=stops.departures)
+
+    area_km2 = np.array([polygon_area_km2(rings) for rings in polygons])
+    reachable = np.isfinite(nearest)
+
+    def mean(values, mask=slice(None)):
+        totals = np.bincount(owner[mask], weights=values[mask], minlength=len(ids))
+        counts = np.bincount(owner[mask], minlength=len(ids))
+        return np.divide(totals, counts, out=np.full(len(ids), np.nan), where=counts > 0)
+
+    stop_owner = GridIndex(polygons).locate(stops.lon, stops.lat)
+    located = stop_owner >= 0
+    metro = located & stops.metro
+    _, first_platform = np.unique(np.array(stops.stations)[metro], return_index=True)
+
+    return TransitAccess(
+        ids=tuple(ids),
+        stops_per_km2=np.divide(
+            np.bincount(stop_owner[located], minlength=len(ids)),
+            area_km2,
+            out=np.full(len(ids), np.nan),
+            where=area_km2 > 0,
+        ),
+        subway_stations=np.bincount(stop_owner[metro][first_platform], minlength=len(ids)),
+        mean_nearest_stop=mean(nearest, reachable),
+        mean_stops_within=mean(within),
+        mean_departures_within=mean(departures),
+    )
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from crime import load_polygons
+
+    parser = argparse.ArgumentParser(
+        description="Calcule l'accessibilité au transport par quartier (valeurs de la source transit)."
+    )
+    parser.add_argument("gtfs", help="répertoire GTFS décompressé (stops.txt, routes.txt, trips.txt, stop_times.txt)")
+    parser.add_argument("quartiers", help="GeoJSON des limites de quartiers")
+    parser.add_argument("--id-property", default="id")
+    parser.add_argument("--radius", type=float, default=WALK_RADIUS, help="rayon de marche (m)")
+    parser.add_argument(
+        "--date",
+        type=lambda value: datetime.datetime.strptime(value, "%Y%m%d").date(),
+        help="date de référence des passages, AAAAMMJJ (défaut : aujourd'hui)",
+    )
+    parser.add_argument(
+        "--measures",
+        action="store_true",
+        help="affiche les moyennes d'accessibilité par quartier au lieu des valeurs de la source transit",
+    )
+    args = parser.parse_args()
+
+    access = transit_access(
+        load_stops(args.gtfs, args.date), *load_polygons(args.quartiers, args.id_property), radius=args.radius
+    )
+    print(json.dumps(access.measures() if args.measures else access.refresh_values(), ensure_ascii=False, indent=2))